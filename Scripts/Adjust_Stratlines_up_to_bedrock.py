@@ -21,6 +21,7 @@ import arcpy
 import os
 import numpy
 import datetime
+import struct
 
 # Record tool start time
 toolstart = datetime.datetime.now()
@@ -62,6 +63,20 @@ def correctGeometry(file, geometry1, geometry2):
             printerror("Error: {0} does not have {1} geometry.".format(os.path.basename(file), geometry1))
     #else: printit("{0} has {1} geometry.".format(os.path.basename(file), geometry))
 
+# Define functions to build line and polygon geometry directly from numpy
+# x and y coordinate arrays using well-known binary
+
+def lineFromXY(x_array, y_array):
+    coords = numpy.column_stack((x_array, y_array)).astype('<f8')
+    wkb = struct.pack('<BII', 1, 2, len(coords)) + coords.tobytes()
+    return arcpy.FromWKB(bytearray(wkb))
+
+def polygonFromXY(x_array, y_array):
+    #close the ring by repeating the first vertex
+    coords = numpy.column_stack((numpy.append(x_array, x_array[0]), numpy.append(y_array, y_array[0]))).astype('<f8')
+    wkb = struct.pack('<BIII', 1, 3, 1, len(coords)) + coords.tobytes()
+    return arcpy.FromWKB(bytearray(wkb))
+
 # %% 
 # 2 Set parameters to work in testing and compiled geopocessing tool
 
@@ -80,7 +95,7 @@ if run_location == "Pro":
     unit_field = arcpy.GetParameterAsText(2)
     poly_ref = arcpy.GetParameterAsText(3)
     output_fc = arcpy.GetParameterAsText(4)
-    temp_gdb = arcpy.GetParameterAsText(5)
+    temp_gdb = arcpy.GetParameterAsText(5) #optional, not used. Temporary files are kept in memory
     printit("Variables set with tool parameter inputs.")
 
 else:
@@ -99,14 +114,20 @@ else:
 county_relief = 700
 vertical_exaggeration = 50
 
+#temporary files are kept in the memory workspace. The temporary geodatabase
+#parameter is optional and unused. It is kept so existing models and scripts that pass it still run.
+temp_dir = 'memory'
 temp_file_list = []
 
+#let the pairwise geoprocessing tools split their work across all cores
+arcpy.env.parallelProcessingFactor = "100%"
+
 #%% 
 # 4 Feature to line to combine bedtopo profiles and stratlines
 #and split the lines at their intersections
 printit("Using feature to line to split lines where they intersect.")
 arcpy.env.overwriteOutput = True
-feat_to_line = os.path.join(temp_gdb, "feat_to_line")
+feat_to_line = os.path.join(temp_dir, "feat_to_line")
 temp_file_list.append(feat_to_line)
 arcpy.management.FeatureToLine([bedtopo_profiles, stratlines], feat_to_line)
 
@@ -114,17 +135,59 @@ arcpy.management.FeatureToLine([bedtopo_profiles, stratlines], feat_to_line)
 # 5 Delete "mn_et_id" and "mn_et_id_1" fields if they exist
 # helps to make sure fields combine correctly
 printit("Re-joining mn_et_id field from reference polygon.")
-if "mn_et_id" in [field.name for field in arcpy.ListFields(feat_to_line)]:
-    arcpy.management.DeleteField(feat_to_line, "mn_et_id")
-if "mn_et_id_1" in [field.name for field in arcpy.ListFields(feat_to_line)]:
-    arcpy.management.DeleteField(feat_to_line, "mn_et_id_1")    
+feat_to_line_fields = {field.name for field in arcpy.ListFields(feat_to_line)}
+delete_fields = [field for field in ["mn_et_id", "mn_et_id_1"] if field in feat_to_line_fields]
+if delete_fields:
+    arcpy.management.DeleteField(feat_to_line, delete_fields)
 
 #%% 
-# 6 Spatial Join with poly ref to re-attach mn_et_id field
+# 6 Re-attach mn_et_id field from poly ref
+# cross sections are stacked vertically, so each line gets the mn_et_id
+# of the poly ref whose y extent contains the line's centroid
+
+feat_to_line_join = feat_to_line
+#mn_et_id is added with the same field type as in poly ref
+mn_et_id_field = arcpy.ListFields(poly_ref, "mn_et_id")[0]
+field_type_dict = {"String": "TEXT", "SmallInteger": "SHORT", "Integer": "LONG", "BigInteger": "BIGINTEGER",
+                   "Single": "FLOAT", "Double": "DOUBLE"}
+mn_et_id_type = field_type_dict.get(mn_et_id_field.type, "TEXT")
+if mn_et_id_type == "TEXT":
+    arcpy.management.AddField(feat_to_line_join, "mn_et_id", "TEXT", field_length=mn_et_id_field.length)
+else:
+    arcpy.management.AddField(feat_to_line_join, "mn_et_id", mn_et_id_type)
 
-feat_to_line_join = os.path.join(temp_gdb, "feat_to_line_join")
-temp_file_list.append(feat_to_line_join)
-arcpy.analysis.SpatialJoin(feat_to_line, poly_ref, feat_to_line_join)
+#make arrays of poly ref y extents sorted by minimum y
+ref_list = []
+with arcpy.da.SearchCursor(poly_ref, ["SHAPE@", "mn_et_id"]) as cursor:
+    for row in cursor:
+        ref_list.append((row[0].extent.YMin, row[0].extent.YMax, row[1]))
+ref_list.sort()
+ref_ymin_array = numpy.array([ref[0] for ref in ref_list])
+ref_ymax_array = numpy.array([ref[1] for ref in ref_list])
+ref_mn_et_id_list = [ref[2] for ref in ref_list]
+
+#count lines that need the nearest poly ref or have no geometry so they can be reported
+nearest_count = 0
+null_count = 0
+with arcpy.da.UpdateCursor(feat_to_line_join, ["SHAPE@Y", "mn_et_id"]) as cursor:
+    for row in cursor:
+        y = row[0]
+        if y is None:
+            null_count += 1
+            continue
+        ref_index = int(numpy.searchsorted(ref_ymin_array, y, side="right")) - 1
+        if ref_index < 0 or y > ref_ymax_array[ref_index]:
+            #centroid falls in a gap between poly refs or outside all of them,
+            #so use the poly ref with the nearest y extent
+            nearest_count += 1
+            ref_index = int(numpy.argmin(numpy.maximum(ref_ymin_array - y, y - ref_ymax_array)))
+        row[1] = ref_mn_et_id_list[ref_index]
+        cursor.updateRow(row)
+
+if nearest_count > 0:
+    printwarning("Warning: {0} lines are outside the y extent of every poly ref polygon. mn_et_id was taken from the nearest poly ref polygon.".format(nearest_count))
+if null_count > 0:
+    printwarning("Warning: {0} lines have no geometry and were not given an mn_et_id.".format(null_count))
 
 #%% 
 # 7 Add unique ID field to temp fc so join works correctly later
@@ -136,9 +199,10 @@ try:
 except:
     printit("Unable to add unique_id field. Field may already exist.")
 
-if 'OBJECTID' in [field.name for field in arcpy.ListFields(feat_to_line_join)]:
+feat_to_line_join_fields = {field.name for field in arcpy.ListFields(feat_to_line_join)}
+if 'OBJECTID' in feat_to_line_join_fields:
     arcpy.management.CalculateField(feat_to_line_join, unique_id_field, "!OBJECTID!")
-elif 'FID' in [field.name for field in arcpy.ListFields(feat_to_line_join)]:
+elif 'FID' in feat_to_line_join_fields:
     arcpy.management.CalculateField(feat_to_line_join, unique_id_field, "!FID!")
 else: printerror("Error: input feature class does not contain OBJECTID or FID field. Conversion will not work without one of these fields.") 
       
@@ -148,162 +212,114 @@ else: printerror("Error: input feature class does not contain OBJECTID or FID fi
 printit("Creating vertical lines that will identify unit below each bedrock segment.")
 arcpy.env.overwriteOutput = True
 #create temp vertical line file with attributes from feat_to_line_join
-vert_line_temp = os.path.join(temp_gdb, "vert_line_temp")
+vert_line_temp = os.path.join(temp_dir, "vert_line_temp")
 temp_file_list.append(vert_line_temp)
-arcpy.management.CreateFeatureclass(temp_gdb, "vert_line_temp", "POLYLINE")
+arcpy.management.CreateFeatureclass(temp_dir, "vert_line_temp", "POLYLINE")
 fields_add = [[unique_id_field, "LONG"], ["mn_et_id", "TEXT"]]
 arcpy.management.AddFields(vert_line_temp, fields_add)
 
 
-#Loop through all line features where unit field == ""
+#Read vertices of all line features where unit field == "" into a numpy array
 where_clause =  "{0}='{1}'".format(unit_field, "")
-with arcpy.da.SearchCursor(feat_to_line_join, ["SHAPE@", 'mn_et_id', unique_id_field], where_clause) as cursor:
-    for line in cursor:
-        mn_et_id = line[1]
-        mn_et_id_int = int(mn_et_id)
-        unique_id = line[2]
-        #make a list of all the vertices in the line
-        pointlist = []
-        for vertex in line[0].getPart(0):
-            point = arcpy.Point(vertex.X, vertex.Y)
-            pointlist.append(point)
-        #vertex 1 = midpoint of the line
-        vertex_num = len(pointlist)
-        mid_index = int(vertex_num/2)
-        midpoint = pointlist[mid_index]
-        #vertex 2 = x coordinate of midpoint, lowest y coordinate on current mn_et_id
-        x_base = midpoint.X
-        y_base = (((50 * 0.3048) - (county_relief * mn_et_id_int)) * vertical_exaggeration) + 23100000
-        basepoint = arcpy.Point(x_base, y_base)
-        geom_array = arcpy.Array([midpoint, basepoint])
-        geom = arcpy.Polyline(geom_array)
-        with arcpy.da.InsertCursor(vert_line_temp, ["SHAPE@", 'mn_et_id', unique_id_field]) as ins_cursor:
-            ins_cursor.insertRow([geom, mn_et_id, unique_id])
+vertex_array = arcpy.da.FeatureClassToNumPyArray(feat_to_line_join, ["OID@", "SHAPE@X", "SHAPE@Y", 'mn_et_id', unique_id_field], where_clause, explode_to_points=True)
+#find index of first vertex and number of vertices for each line
+_, first_index, vertex_count = numpy.unique(vertex_array["OID@"], return_index=True, return_counts=True)
+#vertex 1 = midpoint of each line
+midpoint_array = vertex_array[first_index + (vertex_count // 2)]
+#vertex 2 = x coordinate of midpoint, lowest y coordinate on current mn_et_id
+mn_et_id_int = midpoint_array['mn_et_id'].astype(int)
+y_base_array = (((50 * 0.3048) - (county_relief * mn_et_id_int)) * vertical_exaggeration) + 23100000
+
+bedrock_line_count = len(midpoint_array)
+if bedrock_line_count > 0:
+    with arcpy.da.InsertCursor(vert_line_temp, ["SHAPE@", 'mn_et_id', unique_id_field]) as ins_cursor:
+        for line, y_base in zip(midpoint_array, y_base_array):
+            geom = lineFromXY((line["SHAPE@X"], line["SHAPE@X"]), (line["SHAPE@Y"], y_base))
+            ins_cursor.insertRow([geom, str(line['mn_et_id']), int(line[unique_id_field])])
+else:
+    printwarning("Warning: no bedrock line segments found. Skipping intersect and unit join steps.")
 
 #%% 
 # 9 Intersect vertical lines with stratlines
 # it will only intersect with lines drawn below bedrock
-printit("Intersecting vertical lines with stratlines.")
 arcpy.env.overwriteOutput = True
-intersect = os.path.join(temp_gdb, 'intersect')
-temp_file_list.append(intersect)
-arcpy.analysis.Intersect([vert_line_temp, feat_to_line_join], intersect, '', '', 'POINT')
-intersect_sp = os.path.join(temp_gdb, 'intersect_sp')
-temp_file_list.append(intersect_sp)
-arcpy.management.MultipartToSinglepart(intersect, intersect_sp)
-
-#delete unnecessary fields
-arcpy.management.DeleteField(intersect_sp, [unique_id_field, unit_field, "mn_et_id"], "KEEP_FIELDS")
+intersect = os.path.join(temp_dir, 'intersect')
+intersect_sp = os.path.join(temp_dir, 'intersect_sp')
+if bedrock_line_count > 0:
+    printit("Intersecting vertical lines with stratlines.")
+    temp_file_list.append(intersect)
+    arcpy.analysis.PairwiseIntersect([vert_line_temp, feat_to_line_join], intersect, '', '', 'POINT')
+    temp_file_list.append(intersect_sp)
+    arcpy.management.MultipartToSinglepart(intersect, intersect_sp)
 
 #%% 
 # 10 Delete lines from feat_to_line_join that intersect intersect_sp
 #Use original bedrock lines to create above_polys
 printit("Creating above polys to clip data.")
 arcpy.env.overwriteOutput = True
-above_polys_temp = os.path.join(temp_gdb, "above_polys_temp")
+above_polys_temp = os.path.join(temp_dir, "above_polys_temp")
 temp_file_list.append(above_polys_temp)
-arcpy.management.CreateFeatureclass(temp_gdb, "above_polys_temp", 'POLYGON')
+arcpy.management.CreateFeatureclass(temp_dir, "above_polys_temp", 'POLYGON')
 arcpy.management.AddField(above_polys_temp, 'mn_et_id', 'TEXT')
 
-bedtopo_profiles_sp = os.path.join(temp_gdb, "bedtopo_profiles_sp")
+bedtopo_profiles_sp = os.path.join(temp_dir, "bedtopo_profiles_sp")
 temp_file_list.append(bedtopo_profiles_sp)
 arcpy.management.MultipartToSinglepart(bedtopo_profiles, bedtopo_profiles_sp)
 
-with arcpy.da.SearchCursor(bedtopo_profiles_sp, ['SHAPE@', 'mn_et_id']) as cursor:
-    for row in cursor:
-        mn_et_id = row[1]
-        mn_et_id_int = int(mn_et_id)
-        polyline = row[0]
-        first_pt = polyline.firstPoint
-        last_pt = polyline.lastPoint
-        x_list = []
-        #pointlist = []
-        vertex_list = []
-        for vertex in row[0].getPart(0): #for each vertex in array of point objects
-            x = vertex.X
-            x_list.append(x)
-            y = vertex.Y
-            #y_list.append(y)
-            point = arcpy.Point(vertex.X, vertex.Y)
-            vertex_list.append(point) 
-
-        #get first and last x coordinates from x list
-        first_x = x_list[0]
-        last_x = x_list[-1]
-        #pointlist.append(first_pt)
-        #pointlist.append(last_pt)
-        
+#read vertices of all bedrock profiles into a numpy array
+vertex_array = arcpy.da.FeatureClassToNumPyArray(bedtopo_profiles_sp, ["OID@", "SHAPE@X", "SHAPE@Y", 'mn_et_id'], explode_to_points=True)
+#find index of first vertex and number of vertices for each profile
+_, first_index, vertex_count = numpy.unique(vertex_array["OID@"], return_index=True, return_counts=True)
+#get first and last x coordinates of each profile
+first_x_array = vertex_array["SHAPE@X"][first_index]
+last_x_array = vertex_array["SHAPE@X"][first_index + vertex_count - 1]
+#maximum y based on mn_et_id
+mn_et_id_int = vertex_array['mn_et_id'][first_index].astype(int)
+max_y_array = (((2300 * 0.3048) - (county_relief * mn_et_id_int)) * vertical_exaggeration) + 23100000
+
+with arcpy.da.InsertCursor(above_polys_temp, ['SHAPE@']) as poly_cursor:
+    for start, count, first_x, last_x, max_y in zip(first_index, vertex_count, first_x_array, last_x_array, max_y_array):
+        profile_array = vertex_array[start:start + count]
         #add top two points using first and last x, and maximum y based on mn_et_id
-        max_y = (((2300 * 0.3048) - (county_relief * mn_et_id_int)) * vertical_exaggeration) + 23100000
-        base_pt_1 = arcpy.Point(last_x, max_y)
-        base_pt_2 = arcpy.Point(first_x, max_y)
-        vertex_list.append(base_pt_1)
-        vertex_list.append(base_pt_2)
+        x_array = numpy.append(profile_array["SHAPE@X"], [last_x, first_x])
+        y_array = numpy.append(profile_array["SHAPE@Y"], [max_y, max_y])
         #create polygon geometry object using all vertices along the line, plus the two extra vertices
-        array = arcpy.Array(vertex_list)
-        poly_geometry = arcpy.Polygon(array)
-        with arcpy.da.InsertCursor(above_polys_temp, ['SHAPE@']) as poly_cursor:
-            poly_cursor.insertRow([poly_geometry])
-
-#clip feat_to_line_join with above_polys
-stratlines_above_bedrock = os.path.join(temp_gdb, "stratlines_above_bedrock_temp")
-temp_file_list.append(stratlines_above_bedrock)
-arcpy.analysis.Clip(feat_to_line_join, above_polys_temp, stratlines_above_bedrock)
-
-#delete unnecessary fields
-arcpy.management.DeleteField(stratlines_above_bedrock, [unit_field, "mn_et_id"], "KEEP_FIELDS")
+        poly_geometry = polygonFromXY(x_array, y_array)
+        poly_cursor.insertRow([poly_geometry])
 
 #%%
-# 11 remove bedrock lines (they have nothing in the unit attribute)
-printit("Removing lines with blank unit attribute.")
-with arcpy.da.UpdateCursor(stratlines_above_bedrock, [unit_field]) as cursor:
-    for row in cursor:
-        unit = row[0]
-        unit_strip = unit.strip()
-        if len(unit_strip) < 1:
-            cursor.deleteRow()
+# 11 Clip lines with a unit attribute using above_polys
+# bedrock lines have nothing in the unit attribute, so they are left out
+printit("Clipping lines with a unit attribute to above polys.")
+unit_where = "{0} IS NOT NULL AND TRIM(BOTH ' ' FROM {0}) <> ''".format(unit_field)
+unit_lines_lyr = "unit_lines_lyr"
+arcpy.management.MakeFeatureLayer(feat_to_line_join, unit_lines_lyr, unit_where)
+stratlines_above_bedrock = os.path.join(temp_dir, "stratlines_above_bedrock_temp")
+temp_file_list.append(stratlines_above_bedrock)
+arcpy.analysis.PairwiseClip(unit_lines_lyr, above_polys_temp, stratlines_above_bedrock)
+arcpy.management.Delete(unit_lines_lyr)
 
 #%% 
-# 12 Delete intersect points that have blank unit field
-printit("Removing intersect points with blank unit attributes.")
-with arcpy.da.UpdateCursor(intersect_sp, [unit_field]) as cursor:
-    for row in cursor:
-        unit = row[0]
-        unit_strip = unit.strip()
-        if len(unit_strip) < 1:
-            cursor.deleteRow()
+# 12 Read intersect points that have a unit attribute
+if bedrock_line_count > 0:
+    printit("Reading intersect points with unit attributes.")
+    point_array = arcpy.da.FeatureClassToNumPyArray(intersect_sp, [unique_id_field, unit_field, "SHAPE@Y"], unit_where)
 
 #%% 
-# 13 Make a list of unique id's that have more than one point
-printit("Finding line segments with multiple intersect points and selecting a single intersect point for each bedrock segment based on which is the highest in elevation.")
-unique_id_list = []
-unique_id_duplicate_list = []
-with arcpy.da.SearchCursor(intersect_sp, [unique_id_field]) as cursor:
-    for row in cursor:
-        num = row[0]
-        if num in unique_id_list:
-            unique_id_duplicate_list.append(num)
-        unique_id_list.append(num)
+# 13 Find the highest intersect point for each unique id
+if bedrock_line_count > 0:
+    printit("Finding line segments with multiple intersect points and selecting a single intersect point for each bedrock segment based on which is the highest in elevation.")
+    #sort points by unique id, then by descending y coordinate
+    sort_order = numpy.lexsort((-point_array["SHAPE@Y"], point_array[unique_id_field]))
+    sorted_point_array = point_array[sort_order]
+    #the first point in each unique id group is the highest
+    unique_id_array, first_index = numpy.unique(sorted_point_array[unique_id_field], return_index=True)
 
 #%% 
-# 14 Keep only the point with the highest y coordinate per duplicate unique id
-
-for num in unique_id_duplicate_list:
-    #set starting lowest y value
-    y_low = 0
-    y_list = []
-    where_clause = "{0}={1}".format(unique_id_field, num) 
-    with arcpy.da.SearchCursor(intersect_sp, ["SHAPE@Y"], where_clause) as cursor:
-        for row in cursor:
-            #get y coordinate of point
-            y_coord = row[0]
-            y_list.append(y_coord)
-    y_max = max(y_list)
-    with arcpy.da.UpdateCursor(intersect_sp, ["SHAPE@Y"], where_clause) as cursor:
-        for row in cursor:
-            y_coord = row[0]
-            if y_coord < y_max:
-                cursor.deleteRow()
+# 14 Make dictionary of unique id and the unit of its highest intersect point
+unit_dict = {}
+if bedrock_line_count > 0:
+    unit_dict = dict(zip(unique_id_array.tolist(), sorted_point_array[unit_field][first_index].tolist()))
 
         
 #%% 
@@ -311,17 +327,17 @@ for num in unique_id_duplicate_list:
 printit("Joining unit field.")
 arcpy.env.overwriteOutput = True
 #get only bedrock lines from feat_to_line_join
-temp_br_lines = os.path.join(temp_gdb, "temp_br_lines")
+temp_br_lines = os.path.join(temp_dir, "temp_br_lines")
 temp_file_list.append(temp_br_lines)
 
 where_clause = "{0}='{1}'".format(unit_field, "")
 arcpy.analysis.Select(feat_to_line_join, temp_br_lines, where_clause)
 
-#remove unnecessary fields
-arcpy.management.DeleteField(temp_br_lines, [unique_id_field, "mn_et_id"], "KEEP_FIELDS")
-
-#join unit field
-arcpy.management.JoinField(temp_br_lines, unique_id_field, intersect_sp, unique_id_field, unit_field)
+#fill blank unit field using the dictionary of unique id and unit from intersect points
+with arcpy.da.UpdateCursor(temp_br_lines, [unique_id_field, unit_field]) as cursor:
+    for row in cursor:
+        row[1] = unit_dict.get(row[0])
+        cursor.updateRow(row)
 
 #%% 
 # 16 Merge temp bedrock lines
@@ -331,8 +347,9 @@ arcpy.management.Merge([stratlines_above_bedrock, temp_br_lines], output_fc)
 #%%
 # 17 Delete temporary fields and files
 printit("Deleting temporary files and fields.")
-try: arcpy.management.DeleteField(output_fc, unique_id_field)
-except: printit("Unable to delete unique id field from output.")
+#remove every field except unit and mn_et_id from output in a single pass
+try: arcpy.management.DeleteField(output_fc, [unit_field, "mn_et_id"], "KEEP_FIELDS")
+except: printit("Unable to delete temporary fields from output.")
 
 for file in temp_file_list:
     try: arcpy.management.Delete(file)
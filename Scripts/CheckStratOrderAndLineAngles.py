@@ -24,6 +24,9 @@ import datetime
 # Record tool start time
 toolstart = datetime.datetime.now()
 
+# Allow temp and output files to be overwritten
+arcpy.env.overwriteOutput = True
+
 # Define print statement function for testing and compiled geoprocessing tool
 
 def printit(message):
@@ -61,6 +64,34 @@ def correctGeometry(file, geometry1, geometry2):
             printerror("Error: {0} does not have {1} geometry.".format(os.path.basename(file), geometry1))
     #else: printit("{0} has {1} geometry.".format(os.path.basename(file), geometry))
 
+# Define function to find line segments drawn back on top of the line.
+# Moving away from the lowest vertex, a line drawn left to right should always
+# move right and a line drawn right to left should always move left. Works on
+# the vertices of all lines at once: line_index is the line number of each
+# vertex. Returns the vertex index of the first vertex of each wrong-way
+# segment below the lowest minimum index and above the highest minimum index.
+
+def findAngleErrors(x_array, y_array, line_index, first_index, vertex_count):
+    line_count = len(first_index)
+    vertex_index = numpy.arange(len(x_array))
+    #find the lowest y of each line and the smallest and largest index at that y
+    line_min_y = numpy.full(line_count, numpy.inf)
+    numpy.minimum.at(line_min_y, line_index, y_array)
+    is_min = y_array == line_min_y[line_index]
+    min_index_lo = numpy.full(line_count, len(x_array))
+    numpy.minimum.at(min_index_lo, line_index[is_min], vertex_index[is_min])
+    min_index_hi = numpy.full(line_count, -1)
+    numpy.maximum.at(min_index_hi, line_index[is_min], vertex_index[is_min])
+    #1 if line was drawn left to right, -1 if right to left
+    line_direction = numpy.sign(x_array[first_index + vertex_count - 1] - x_array[first_index])
+    #segments from each vertex to the next vertex on the same line
+    segment_index = vertex_index[:-1][line_index[:-1] == line_index[1:]]
+    segment_line = line_index[segment_index]
+    wrong_way = (x_array[segment_index + 1] - x_array[segment_index]) * line_direction[segment_line] < 0
+    lower_errors = segment_index[wrong_way & (segment_index < min_index_lo[segment_line])]
+    upper_errors = segment_index[wrong_way & (segment_index >= min_index_hi[segment_line])]
+    return lower_errors, upper_errors
+
 # %% 
 # 2 Set parameters to work in testing and compiled geopocessing tool
 
@@ -109,21 +140,9 @@ elif xsln_spacing < 800:
 #%% 
 # 3 Set up unit list
 printit("Creating unit list from text file.")
-txt_file = open(unitlist_txt).readlines()
-#create empty list for appending unit names
-unitlist = []
-#remove "\n" line break from each unit name and add to empty list
-for units in txt_file:
-    replace = units.replace("\n", "")
-    unitlist.append(replace)
-#remove extra spaces and tabs from list items
-i = 0
-while i < len(unitlist):
-    unitlist[i] = unitlist[i].strip()
-    i += 1
-#remove blank list items
-while '' in unitlist:
-    unitlist.remove('')
+#remove line breaks, extra spaces and tabs from each unit name, and skip blank lines
+with open(unitlist_txt) as txt_file:
+    unitlist = [units.strip() for units in txt_file if units.strip()]
 
 #check for duplicates in unit list
 def duplicatecheck(list):
@@ -137,34 +156,92 @@ duplicatecheck(unitlist)
 #%% 
 # 4 Dissolve stratlines by unit, no multipart features
 
-arcpy.env.overwriteOutput = True
 #this ensures all stratlines are single part, reducing the number of polys that need to be made
-printit("Dissolving stratlines by unit and storing as temporary file.")
 stratlines_temp1 = os.path.join(temp_dir, 'stratlines_temp1')
-arcpy.management.Dissolve(stratlines_original, stratlines_temp1, stratline_unit_field, '', 'SINGLE_PART')
+#dissolve is only needed if there are multipart or empty lines, or more than one line of a unit
+needs_dissolve = False
+stratline_units = set()
+with arcpy.da.SearchCursor(stratlines_original, ['SHAPE@', stratline_unit_field]) as cursor:
+    for row in cursor:
+        if row[0] is None or row[0].partCount != 1 or row[1] in stratline_units:
+            needs_dissolve = True
+            break
+        stratline_units.add(row[1])
+
+if needs_dissolve:
+    printit("Dissolving stratlines by unit and storing as temporary file.")
+    arcpy.management.Dissolve(stratlines_original, stratlines_temp1, stratline_unit_field, '', 'SINGLE_PART')
+else:
+    #stratlines are already one single part line per unit, so copy them and keep only the unit field
+    printit("Copying stratlines to temporary file.")
+    arcpy.management.CopyFeatures(stratlines_original, stratlines_temp1)
+    arcpy.management.DeleteField(stratlines_temp1, [stratline_unit_field], "KEEP_FIELDS")
 
 #%% 
-# 5 spatial join with mn_et_id polys
-arcpy.env.overwriteOutput = True
+# 5 Add mn_et_id from poly ref to temp stratline file
+# cross sections are stacked vertically, so each line gets the mn_et_id
+# of the poly ref whose y extent contains the line's centroid
 printit("Joining mn_et_id to temp stratline file")
-stratlines_temp2 = os.path.join(temp_dir, 'stratlines_temp2')
-arcpy.analysis.SpatialJoin(stratlines_temp1, poly_ref, stratlines_temp2)
-#arcpy.analysis.SpatialJoin(stratlines_temp1, poly_ref, stratlines_temp2, '', '', '', 'WITHIN')
+#mn_et_id is added with the same field type as in poly ref
+mn_et_id_field = arcpy.ListFields(poly_ref, "mn_et_id")[0]
+field_type_dict = {"String": "TEXT", "SmallInteger": "SHORT", "Integer": "LONG", "BigInteger": "BIGINTEGER",
+                   "Single": "FLOAT", "Double": "DOUBLE"}
+mn_et_id_type = field_type_dict.get(mn_et_id_field.type, "TEXT")
+if mn_et_id_type == "TEXT":
+    arcpy.management.AddField(stratlines_temp1, "mn_et_id", "TEXT", field_length=mn_et_id_field.length)
+else:
+    arcpy.management.AddField(stratlines_temp1, "mn_et_id", mn_et_id_type)
+
+#make arrays of poly ref y extents sorted by minimum y
+ref_list = []
+with arcpy.da.SearchCursor(poly_ref, ["SHAPE@", "mn_et_id"]) as cursor:
+    for row in cursor:
+        ref_list.append((row[0].extent.YMin, row[0].extent.YMax, row[1]))
+ref_list.sort()
+ref_ymin_array = numpy.array([ref[0] for ref in ref_list])
+ref_ymax_array = numpy.array([ref[1] for ref in ref_list])
+ref_mn_et_id_list = [ref[2] for ref in ref_list]
+
+#count lines that need the nearest poly ref or have no geometry so they can be reported
+nearest_count = 0
+null_count = 0
+with arcpy.da.UpdateCursor(stratlines_temp1, ["SHAPE@Y", "mn_et_id"]) as cursor:
+    for row in cursor:
+        y = row[0]
+        if y is None:
+            null_count += 1
+            continue
+        ref_index = int(numpy.searchsorted(ref_ymin_array, y, side="right")) - 1
+        if ref_index < 0 or y > ref_ymax_array[ref_index]:
+            #centroid falls in a gap between poly refs or outside all of them,
+            #so use the poly ref with the nearest y extent
+            nearest_count += 1
+            ref_index = int(numpy.argmin(numpy.maximum(ref_ymin_array - y, y - ref_ymax_array)))
+        row[1] = ref_mn_et_id_list[ref_index]
+        cursor.updateRow(row)
+
+if nearest_count > 0:
+    printwarning("Warning: {0} lines are outside the y extent of every poly ref polygon. mn_et_id was taken from the nearest poly ref polygon.".format(nearest_count))
+if null_count > 0:
+    printwarning("Warning: {0} lines have no geometry and were not given an mn_et_id.".format(null_count))
 
 #%% 
 # 6 Create empty above polys for each stratline
 
-arcpy.env.overwriteOutput = True
-#create empty output polygon file and add unit field
+#create empty output polygon file with stratline spatial reference and add unit and mn_et_id fields
+#mn_et_id is stored as a number so it matches the stratline mn_et_id in any field type
+spatial_ref = arcpy.Describe(stratlines_temp1).spatialReference
 above_polys = os.path.join(temp_dir, 'above_polys')
-arcpy.management.CreateFeatureclass(temp_dir, 'above_polys', 'POLYGON')
-arcpy.management.AddField(above_polys, stratline_unit_field, 'TEXT')
+arcpy.management.CreateFeatureclass(temp_dir, 'above_polys', 'POLYGON', spatial_reference=spatial_ref)
+arcpy.management.AddFields(above_polys, [[stratline_unit_field, 'TEXT'], ['mn_et_id', 'DOUBLE']])
 
 #%% 
 # 7 Create empty angle errors point output for geometry creation
 
+#features are written to a temp file in memory and copied to the output location at the end
 printit("Creating empty angle error point file.")
-arcpy.management.CreateFeatureclass(input_directory, 'line_angle_errors', 'POINT')
+arcpy.management.CreateFeatureclass(temp_dir, 'line_angle_errors_temp', 'POINT')
+point_out_fc_temp = os.path.join(temp_dir, 'line_angle_errors_temp')
 point_out_fc = os.path.join(input_directory, 'line_angle_errors')
 
 if run_location == "Pro":
@@ -172,13 +249,15 @@ if run_location == "Pro":
     arcpy.SetParameterAsText(6, point_out_fc)
 
 
-arcpy.management.AddField(point_out_fc, stratline_unit_field, 'TEXT')
+arcpy.management.AddField(point_out_fc_temp, stratline_unit_field, 'TEXT')
 
 #%% 
 # 8 Create empty order errors line file
 
+#features are written to a temp file in memory and copied to the output location at the end
 printit("Creating empty order error line file.")
-arcpy.management.CreateFeatureclass(input_directory, 'strat_order_errors', 'POLYLINE')
+arcpy.management.CreateFeatureclass(temp_dir, 'strat_order_errors_temp', 'POLYLINE')
+line_out_fc_temp = os.path.join(temp_dir, "strat_order_errors_temp")
 line_out_fc = os.path.join(input_directory,"strat_order_errors")
 
 if run_location == "Pro":
@@ -186,213 +265,143 @@ if run_location == "Pro":
     arcpy.SetParameterAsText(5, line_out_fc)
 
 
-arcpy.management.AddField(line_out_fc, stratline_unit_field, 'TEXT')
+arcpy.management.AddField(line_out_fc_temp, stratline_unit_field, 'TEXT')
 
 #%% 
 # 9 Create geometry for "above_polys" and check for angle errors
 printit("Creating temporary polygons for stratlines and finding angle errors.")
-with arcpy.da.SearchCursor(stratlines_temp2, ['SHAPE@', stratline_unit_field, 'mn_et_id']) as line_cursor:
-    for row in line_cursor:
-        unit = row[1]
-        mn_et_id = row[2]
-        mn_et_id_float = float(mn_et_id)
-        #make empty lists for storing all vertices and x coordinates
-        vertex_list = []
-        x_list = []
-        y_list = []
-        angle_error_pointlist = []
-        #make list of vertices in stratline, populate x list
-        for vertex in row[0].getPart(0): #for each vertex in array of point objects
-            x = vertex.X
-            x_list.append(x)
-            y = vertex.Y
-            y_list.append(y)
-            point = arcpy.Point(vertex.X, vertex.Y)
-            vertex_list.append(point) 
-        #get first and last x coordinates from x list
+#read vertices of all stratlines into a numpy array
+vertex_array = arcpy.da.FeatureClassToNumPyArray(stratlines_temp1, ['OID@', 'SHAPE@X', 'SHAPE@Y', stratline_unit_field, 'mn_et_id'], explode_to_points=True)
+#find index of first vertex and number of vertices for each stratline,
+#and the stratline number of each vertex
+_, first_index, line_index, vertex_count = numpy.unique(vertex_array['OID@'], return_index=True, return_inverse=True, return_counts=True)
+x_all = vertex_array['SHAPE@X']
+y_all = vertex_array['SHAPE@Y']
+unit_all = vertex_array[stratline_unit_field]
+
+#find segments of every stratline that are drawn back toward its minimum
+lower_errors, upper_errors = findAngleErrors(x_all, y_all, line_index, first_index, vertex_count)
+lower_error_count = numpy.bincount(line_index[lower_errors], minlength=len(first_index))
+upper_error_count = numpy.bincount(line_index[upper_errors], minlength=len(first_index))
+#both vertices of each error segment are error points
+error_index = numpy.concatenate((lower_errors, lower_errors + 1, upper_errors, upper_errors + 1))
+
+#maximum y is calculated once for each mn_et_id
+max_y_dict = {}
+with arcpy.da.InsertCursor(point_out_fc_temp, ['SHAPE@', stratline_unit_field]) as point_cursor, arcpy.da.InsertCursor(above_polys, ['SHAPE@', stratline_unit_field, 'mn_et_id']) as poly_cursor:
+    #add points into angle error file
+    for i in error_index:
+        point_cursor.insertRow([arcpy.Point(x_all[i], y_all[i]), str(unit_all[i])])
+
+    for line_num, (start, count) in enumerate(zip(first_index, vertex_count)):
+        line_array = vertex_array[start:start + count]
+        unit = str(line_array[stratline_unit_field][0])
+        mn_et_id_float = float(line_array['mn_et_id'][0])
+        x_array = line_array['SHAPE@X']
+        y_array = line_array['SHAPE@Y']
+        #get first and last x coordinates
         #used to determine if line was drawn left to right or right to left
-        first_x = x_list[0]
-        last_x = x_list[-1]
-        
-        #get index of minimum y coordinate
-        #this may be a list if there are multiple point at with the exact same y value
-        min_index_list = numpy.where(y_list == numpy.min(y_list))[0]
-        
-        #if line was drawn left to right
+        first_x = x_array[0]
+        last_x = x_array[-1]
+    
         if first_x < last_x:
-            #check the points to the LEFT of minimum
-            #find the index of the point with the minimum y value. If there are
-            #multiple points with the same y value, choose the SMALLEST index.
-            min_index = min(min_index_list)
-            #store the point object with the minimum y, calling it "previous point"
-            previous_point = vertex_list[min_index]
-            #loop through all of the points in the list whose indices are LESS
-            #than the the minimum index, starting with the one right next to it
-            for i in range(min_index - 1, -1, -1):
-                current_point = vertex_list[i]
-                #if the x value is GREATER than the x value of the previous point
-                if current_point.X > previous_point.X:
-                    printit("Appending angle error point on unit {0}. Line drawn left to right, error is left of center.".format(unit))
-                    #append the point to the angle error pointlist
-                    angle_error_pointlist.append(current_point)
-                    #append the previous point to the angle error pointlist too
-                    angle_error_pointlist.append(previous_point)
-                #reset the previous point value to the current point for the next loop iteration
-                previous_point = current_point
-                
-            #check the points to the RIGHT of minimum
-            #find the index of the point with the minimum y value. If there are
-            #multiple points with the same y value, choose the LARGEST index.
-            min_index = max(min_index_list)
-            #store the point object with the minimum y, calling it "previous point"
-            previous_point = vertex_list[min_index]
-            #loop through all of the points in the list whose indices are GREATER
-            #than the the minimum index, starting with the one right next to it
-            for i in range(min_index + 1, len(vertex_list), 1):
-                current_point = vertex_list[i]
-                #if the x value is LESS than the x value of the previous point
-                if current_point.X < previous_point.X:
-                    printit("Appending angle error point on unit {0}. Line drawn left to right, error is right of center.".format(unit))
-                    #append the point to the angle error pointlist
-                    angle_error_pointlist.append(current_point)
-                    #append the previous point to the angle error pointlist too
-                    angle_error_pointlist.append(previous_point)
-                #reset the previous point value to the current point for the next loop iteration
-                previous_point = current_point
-            
-        #if line was drawn right to left
-        if first_x > last_x:
-            #check the points to the RIGHT of minimum
-            #find the index of the point with the minimum y value. If there are
-            #multiple points with the same y value, choose the SMALLEST index.
-            min_index = min(min_index_list)
-            #store the point object with the minimum y, calling it "previous point"
-            previous_point = vertex_list[min_index]
-            #loop through all of the points in the list whose indices are LESS
-            #than the the minimum index, starting with the one right next to it
-            for i in range(min_index - 1, -1, -1):
-                current_point = vertex_list[i]
-                #if the x value is LESS than the x value of the previous point
-                if current_point.X < previous_point.X:
-                    printit("Appending angle error point on unit {0}. Line drawn right to left, error is right of center.".format(unit))
-                    #append the point to the angle error pointlist
-                    angle_error_pointlist.append(current_point)
-                    #append the previous point to the angle error pointlist too
-                    angle_error_pointlist.append(previous_point)
-                #reset the previous point value to the current point for the next loop iteration
-                previous_point = current_point
+            lower_side, upper_side, direction = "left", "right", "left to right"
+        else:
+            lower_side, upper_side, direction = "right", "left", "right to left"
+        if lower_error_count[line_num] > 0:
+            printit("Appending {0} angle error points on unit {1}. Line drawn {2}, error is {3} of center.".format(2 * lower_error_count[line_num], unit, direction, lower_side))
+        if upper_error_count[line_num] > 0:
+            printit("Appending {0} angle error points on unit {1}. Line drawn {2}, error is {3} of center.".format(2 * upper_error_count[line_num], unit, direction, upper_side))
                 
-            #check the points to the LEFT of minimum
-            #find the index of the point with the minimum y value. If there are
-            #multiple points with the same y value, choose the LARGEST index.
-            min_index = max(min_index_list)
-            #store the point object with the minimum y, calling it "previous point"
-            previous_point = vertex_list[min_index]
-            #loop through all of the points in the list whose indices are GREATER
-            #than the the minimum index, starting with the one right next to it
-            for i in range(min_index + 1, len(vertex_list), 1):
-                current_point = vertex_list[i]
-                #if the x value is GREATER than the x value of the previous point
-                if current_point.X > previous_point.X:
-                    printit("Appending angle error point on unit {0}. Line drawn right to left, error is left of center.".format(unit))
-                    #append the point to the angle error pointlist
-                    angle_error_pointlist.append(current_point)
-                    #append the previous point to the angle error pointlist too
-                    angle_error_pointlist.append(previous_point)
-                #reset the previous point value to the current point for the next loop iteration
-                previous_point = current_point
-        
-        
-        #add points into angle error file
-        for error in angle_error_pointlist:
-            with arcpy.da.InsertCursor(point_out_fc, ['SHAPE@', stratline_unit_field]) as point_cursor:
-                point_cursor.insertRow([error, unit])
-                    
         #add top two points using first and last x, and maximum y based on mn_et_id
-        max_y = (((max_ele * 0.3048) - (county_relief * mn_et_id_float)) * vertical_exaggeration) + 23100000
-        #max_y = (((2300 * 0.3048) - (county_relief * mn_et_id_float)) * vertical_exaggeration) + 23100000
-        #max_y = (((1150 * 0.3048) - (county_relief * mn_et_id_float)) * vertical_exaggeration) + 23100000
-
-        base_pt_1 = arcpy.Point(last_x, max_y)
-        base_pt_2 = arcpy.Point(first_x, max_y)
-        vertex_list.append(base_pt_1)
-        vertex_list.append(base_pt_2)
+        max_y = max_y_dict.get(mn_et_id_float)
+        if max_y is None:
+            max_y = (((max_ele * 0.3048) - (county_relief * mn_et_id_float)) * vertical_exaggeration) + 23100000
+            max_y_dict[mn_et_id_float] = max_y
+
+        poly_x_array = numpy.append(x_array, [last_x, first_x])
+        poly_y_array = numpy.append(y_array, [max_y, max_y])
         #create polygon geometry object using all vertices along the line, plus the two extra vertices
-        array = arcpy.Array(vertex_list)
-        poly_geometry = arcpy.Polygon(array)
-        #insert cursor into polygon feature class. make sure to add unit attribute
-        with arcpy.da.InsertCursor(above_polys, ['SHAPE@', stratline_unit_field]) as poly_cursor:
-            poly_cursor.insertRow([poly_geometry, unit])
+        array = arcpy.Array([arcpy.Point(x, y) for x, y in zip(poly_x_array, poly_y_array)])
+        poly_geometry = arcpy.Polygon(array, spatial_ref)
+        #insert cursor into polygon feature class. make sure to add unit and mn_et_id attributes
+        poly_cursor.insertRow([poly_geometry, unit, mn_et_id_float])
 
 #%% 
-# 10 Make temp feature layer of stratlines. Will be used to loop thru and delete
+# 10 Make dictionary of stratline geometries by unit and mn_et_id
+#extent of each line is stored with it so it is only read once
 
-strat_lyr = "strat_lyr"
-arcpy.management.MakeFeatureLayer(stratlines_temp2, strat_lyr)
+stratline_dict = {}
+with arcpy.da.SearchCursor(stratlines_temp1, ['SHAPE@', stratline_unit_field, 'mn_et_id']) as cursor:
+    for row in cursor:
+        #lines without geometry or mn_et_id cannot overlap an above poly
+        if row[0] is None or row[2] is None:
+            continue
+        stratline_dict.setdefault((row[1], float(row[2])), []).append((row[0], row[0].extent))
 
 #%% 
-# 11 Make temp stratline files
-printit("Making temp stratline files. Time is {0}.".format(datetime.datetime.now()))
-
-arcpy.env.overwriteOutput = True
-for unit in unitlist:
-    #select all lines in temp stratline feature layer where 'unit' field == unit
-    where_clause = "{0}='{1}'".format(stratline_unit_field, unit)
-    arcpy.management.SelectLayerByAttribute(strat_lyr, '', where_clause)
-    #delete selected features
-    arcpy.management.DeleteFeatures(strat_lyr)
-    #export copy as "above_" + unit
-    arcpy.conversion.FeatureClassToFeatureClass(strat_lyr, temp_dir, "below_" + unit)
+# 11 Make dictionary of above poly geometry by unit and mn_et_id
+#above polys of the same unit on the same cross section are combined into one geometry
 
-arcpy.management.Delete(strat_lyr)
+above_poly_dict = {}
+with arcpy.da.SearchCursor(above_polys, ['SHAPE@', stratline_unit_field, 'mn_et_id']) as cursor:
+    for row in cursor:
+        key = (row[1], row[2])
+        if key in above_poly_dict:
+            above_poly_dict[key] = above_poly_dict[key].union(row[0])
+        else:
+            above_poly_dict[key] = row[0]
 
 #%% 
-# 12 Clip below unit files using polygon feature classes
-arcpy.env.overwriteOutput = True
-printit("Clipping temp stratline files. Time is {0}.".format(datetime.datetime.now()))
-for unit in unitlist: 
-    #Create feature layer of above polys for the unit
-    where_clause = "{0}='{1}'".format(stratline_unit_field, unit)
-    unit_polys = unit + "_polys"
-    arcpy.management.MakeFeatureLayer(above_polys, unit_polys, where_clause)
-    #find corresponding below lines file
-    below_line_file = os.path.join(temp_dir, "below_" + unit)
-    #clip below lines file with strat poly feature layer
-    #save as unit + "_order_error"
-    unit_order_error = os.path.join(temp_dir, unit + "_order_error")
-    arcpy.analysis.Clip(below_line_file, unit_polys, unit_order_error)
-    #multipart to singlepart
-    unit_order_error_split = os.path.join(temp_dir, unit + "_order_error_split")
-    arcpy.management.MultipartToSinglepart(unit_order_error, unit_order_error_split)
-    #append features to output order error fc
-    arcpy.management.Append(unit_order_error_split, line_out_fc, 'NO_TEST')
-    arcpy.management.Delete(below_line_file)
-    arcpy.management.Delete(unit_order_error)
-    arcpy.management.Delete(unit_order_error_split)
+# 12 Clip lines below each unit with the above polys of the unit
+printit("Clipping stratlines with above polys. Time is {0}.".format(datetime.datetime.now()))
+#lines below a unit are lines of every unit that is lower in the unit list,
+#plus lines of units that are not in the unit list.
+#above polys only overlap lines on the same cross section, so lines are only
+#clipped with the above poly that has the same mn_et_id
+above_units = set()
+with arcpy.da.InsertCursor(line_out_fc_temp, ['SHAPE@', stratline_unit_field]) as cursor:
+    for unit in unitlist:
+        above_units.add(unit)
+        for (line_unit, mn_et_id), line_list in stratline_dict.items():
+            if line_unit in above_units:
+                continue
+            unit_poly = above_poly_dict.get((unit, mn_et_id))
+            if unit_poly is None:
+                continue
+            unit_extent = unit_poly.extent
+            for geometry, line_extent in line_list:
+                #skip lines that are nowhere near the polygon
+                if line_extent.disjoint(unit_extent):
+                    continue
+                #clip line with polygon, then write each part as a single part line
+                #tiny line segments are left out
+                order_error = geometry.intersect(unit_poly, 2)
+                for i in range(order_error.partCount):
+                    order_error_part = arcpy.Polyline(order_error.getPart(i), spatial_ref)
+                    if order_error_part.length >= 1:
+                        cursor.insertRow([order_error_part, line_unit])
 
 #%% 
-# 13 Delete tiny features
+# 13 Copy outputs from memory and delete temporary files
+printit("Saving output files.")
+arcpy.management.CopyFeatures(point_out_fc_temp, point_out_fc)
+arcpy.management.CopyFeatures(line_out_fc_temp, line_out_fc)
 
-printit("Deleting unnecessary line segments.")
-with arcpy.da.UpdateCursor(line_out_fc, ['Shape_Length']) as cursor:
-    for row in cursor:
-        length = row[0]
-        if length < 1:
-            cursor.deleteRow()
+try: arcpy.management.Delete(point_out_fc_temp)
+except: printit("Unable to delete temp file {0}".format(point_out_fc_temp))
+
+try: arcpy.management.Delete(line_out_fc_temp)
+except: printit("Unable to delete temp file {0}".format(line_out_fc_temp))
 
-#%% 
-# 14 Delete temporary files
 try: arcpy.management.Delete(stratlines_temp1)
 except: printit("Unable to delete temp file {0}".format(stratlines_temp1))
 
-try: arcpy.management.Delete(stratlines_temp2)
-except: printit("Unable to delete temp file {0}".format(stratlines_temp2))
-
 try: arcpy.management.Delete(above_polys)
 except: printit("Unable to delete temp file {0}".format(above_polys))
 
 #%% 
-# 15 Set symbology of output
+# 14 Set symbology of output
 
 line_symbol = r'J:\ArcGIS_scripts\ArcPro\MGS_CrossSectionTools\Symbology\strat_order_errors.lyrx'
 point_symbol = r'J:\ArcGIS_scripts\ArcPro\MGS_CrossSectionTools\Symbology\line_angle_errors.lyrx'
@@ -404,7 +413,7 @@ except:
     printit("Unable to apply symbology from layer. Check with GIS staff for help.")
 
 #%% 
-# 16 Record and print tool end time
+# 15 Record and print tool end time
 toolend = datetime.datetime.now()
 toolelapsed = toolend - toolstart
 printit('Tool completed at {0}. Elapsed time: {1}. Youre a wizard!'.format(toolend, toolelapsed))
\ No newline at end of file
@@ -119,7 +119,7 @@ if qstrat_editing_gdb == True:
 #county boundary
 printit("Copying county boundary.")
 county_boundary_out = os.path.join(output_gdb, 'county_boundary')
-arcpy.conversion.ExportFeatures(county_boundary_in, county_boundary_out)
+arcpy.management.CopyFeatures(county_boundary_in, county_boundary_out)
 
 try:
     printit("Copying bedrock topography.")
@@ -131,7 +131,7 @@ except:
 try:
     printit("Copying cross section line file.")
     xsln_out = os.path.join(output_gdb, os.path.basename(xsln_in))
-    arcpy.conversion.ExportFeatures(xsln_in, xsln_out)
+    arcpy.management.CopyFeatures(xsln_in, xsln_out)
 except:
     printit("No cross section lines copied from existing file.")
 
@@ -154,24 +154,12 @@ arcpy.analysis.Buffer(county_boundary_out, mapping_boundary, project_buffer_area
 #%% 
 # 7 Create papg from mapping boundary extent
 printit("Creating project area polygon rectangle based on mapping boundary extent.")
-#make empty list of x and y vertices
-x_list = []
-y_list = []
-
-#read geometry of mapping boundary polygon and populate lists
-with arcpy.da.SearchCursor(mapping_boundary, ["Shape@"]) as cursor:
-    for row in cursor:
-        for vertex in cursor[0].getPart(0):
-            x = vertex.X
-            x_list.append(x)
-            y = vertex.Y
-            y_list.append(y)
-
-#find min and max values from lists
-x_min = min(x_list)
-x_max = max(x_list)
-y_min = min(y_list)
-y_max = max(y_list)
+#get min and max values from mapping boundary extent
+extent = arcpy.Describe(mapping_boundary).extent
+x_min = extent.XMin
+x_max = extent.XMax
+y_min = extent.YMin
+y_max = extent.YMax
 
 #make point objects for corners of the papg
 vertex_1 = arcpy.Point(x_min, y_min)
@@ -202,30 +190,16 @@ if qstrat_xsln_file == True:
 
     printit("Adding et_id field and calculating based on mn_et_id.")
     #add et_id field
-    #create blank mn_et_id list
-    mn_id_list = []
-    #create list of mn_et_id values with integer data type
-    with arcpy.da.SearchCursor(xsln, ['mn_et_id']) as xsln_cursor:
-        for row in xsln_cursor:
-            mn_et_id = row[0]
-            mn_et_id_int = int(mn_et_id)
-            mn_id_list.append(mn_et_id_int)
-
     #find minimum mn_et_id
-    min_mn_id = min(mn_id_list)    
-    subtract_value = min_mn_id - 1
+    mn_id_array = arcpy.da.FeatureClassToNumPyArray(xsln, ['mn_et_id'])['mn_et_id'].astype(int)
+    subtract_value = int(mn_id_array.min()) - 1
 
     #add et_id field to xsln
     arcpy.management.AddField(xsln, "et_id", "TEXT", '', '', 5)
     with arcpy.da.UpdateCursor(xsln, ["mn_et_id", "et_id"]) as xsln_update:
         for row in xsln_update:
-            mn_et_id = row[0]
-            mn_et_id_int = int(mn_et_id)
-            et_id_int = mn_et_id_int - subtract_value
-            et_id = str(et_id_int)
-            if len (et_id) == 1:
-                et_id = "0" + et_id   
-            row[1] = et_id
+            #et_id is zero padded to at least two digits
+            row[1] = "{0:02d}".format(int(row[0]) - subtract_value)
             xsln_update.updateRow(row)
 
 else:
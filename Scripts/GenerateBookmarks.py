@@ -4,22 +4,32 @@
 
 
 import arcpy
-from pathlib import Path
-def _create_bookmark_dict(in_geometry, min_dist):
-    """Returns a dict defining a bookmark for the input arcpy.Geometry object."""
-    e = in_geometry.extent
-    d = min([e.width, e.height])
-    if d < min_dist:
-        buffered_geometry = in_geometry.buffer((min_dist - d) / 2)
-        e = buffered_geometry.extent
+import json
+def _create_bookmark_dict(xmin, ymin, xmax, ymax, wkid, buffer_dist, min_dist):
+    """Returns a dict defining a bookmark for the input extent coordinates, or None if the buffered extent is empty."""
+    # buffering the features grows (or shrinks) their extent by the buffer distance on every side
+    xmin -= buffer_dist
+    xmax += buffer_dist
+    ymin -= buffer_dist
+    ymax += buffer_dist
+    if xmin > xmax or ymin > ymax:
+        return None
+    if min_dist > 0:
+        d = min(xmax - xmin, ymax - ymin)
+        if d < min_dist:
+            pad = (min_dist - d) / 2
+            xmin -= pad
+            xmax += pad
+            ymin -= pad
+            ymax += pad
     return {
         "type": "CIMBookmark",
         "location": {
-            "xmin": e.XMin,
-            "xmax": e.XMax,
-            "ymin": e.YMin,
-            "ymax": e.YMax,
-            "spatialReference": {"wkid": in_geometry.spatialReference.factoryCode}
+            "xmin": xmin,
+            "xmax": xmax,
+            "ymin": ymin,
+            "ymax": ymax,
+            "spatialReference": {"wkid": wkid}
             }
         }
     
@@ -34,35 +44,49 @@ def create_bookmarks(in_features, out_path, name_field=None, dissolve_field=None
     
     """
     # dissolve features
-    if dissolve_field not in [None, "", "#"]:
-        in_features = arcpy.management.Dissolve(in_features, "memory/dissolve", [dissolve_field])
-        if name_field not in [None, "", "#"]:
+    has_name = name_field not in (None, "", "#")
+    if dissolve_field not in (None, "", "#"):
+        in_features = arcpy.management.Dissolve(in_features, "memory/dissolve", [dissolve_field])[0]
+        if has_name:
             name_field = dissolve_field
-    # buffer features
-    if buffer_dist is not None:
-    #if buffer_dist is not None and buffer_dist > 0:
-        in_features = arcpy.analysis.Buffer(in_features, "memory/buffer", buffer_dist)
+    # buffer distance is applied to the extent of each feature
+    if buffer_dist is None:
+        buffer_dist = 0
     # create the bookmarks
     if min_dist is None or min_dist < 0:
         min_dist = 0
-    bookmarks = []
+    wkid = arcpy.Describe(in_features).spatialReference.factoryCode
     read_fields = ["SHAPE@"]
-    if name_field not in [None, "", "#"]:
+    if has_name:
         read_fields.append(name_field)
-    for i, row in enumerate(arcpy.da.SearchCursor(in_features, read_fields)):
-        try:
-            bm = _create_bookmark_dict(row[0], min_dist)
-        except:  # eg null geometry
-            continue
-        if name_field not in [None, "", "#"] and row[1] is not None:
-            bm["name"] = row[1]
-        else:
-            bm["name"] = str(i)
-        bookmarks.append(bm)
-    # write bkmx file
-    out_dict = {"bookmarks": bookmarks}
-    f = Path(str(out_path))
-    f.write_text(str(out_dict))
+    # write bkmx file, one bookmark at a time through a 1 MB write buffer
+    with open(out_path, "w", buffering=1 << 20) as f, arcpy.da.SearchCursor(in_features, read_fields) as cursor:
+        # local names for the calls made on every row
+        write = f.write
+        dump = json.dump
+        create_bookmark_dict = _create_bookmark_dict
+        write('{"bookmarks":[')
+        first = True
+        for i, row in enumerate(cursor):
+            geom = row[0]
+            if geom is None:  # SHAPE@ is None for a null geometry, which has no extent
+                continue
+            extent = geom.extent
+            bm = create_bookmark_dict(extent.XMin, extent.YMin, extent.XMax, extent.YMax, wkid, buffer_dist, min_dist)
+            if bm is None:  # eg feature removed by negative buffer
+                continue
+            if has_name and row[1] is not None:
+                bm["name"] = row[1]
+            else:
+                bm["name"] = str(i)
+            if not first:
+                write(",")
+            dump(bm, f, separators=(",", ":"), default=str)
+            first = False
+        write("]}")
+    # the cursor is closed, so the dissolved features can be removed
+    if dissolve_field not in (None, "", "#"):
+        arcpy.management.Delete(in_features)
 if __name__ == "__main__":
     in_features = arcpy.GetParameter(0)
     out_path = arcpy.GetParameterAsText(1)
@@ -19,6 +19,9 @@ import datetime
 # Record tool start time
 toolstart = datetime.datetime.now()
 
+# Allow temp and output files to be overwritten
+arcpy.env.overwriteOutput = True
+
 # Define print statement function for testing and compiled geoprocessing tool
 
 def printit(message):
@@ -72,7 +75,7 @@ if run_location == "Pro":
     #variable = arcpy.GetParameterAsText(0)
     output_gdb = arcpy.GetParameterAsText(0)
     xsln = arcpy.GetParameterAsText(1)
-    buffer_distance = int(arcpy.GetParameterAsText(2)) #meters
+    buffer_distance = arcpy.GetParameter(2) #meters
     printit("Variables set with tool parameter inputs.")
 
 else:
@@ -82,6 +85,8 @@ else:
     buffer_distance = 500 #meters, half of xsln spacing
     printit("Variables set with hard-coded parameters for testing.")
 
+#let the spatial joins split their work across all cores
+arcpy.env.parallelProcessingFactor = "100%"
 
 #%% 3 Buffer xsln file
 printit("Buffering xsln file.")
@@ -89,23 +94,15 @@ printit("Buffering xsln file.")
 xsln_buffer = os.path.join(output_gdb, "xsln_buffer")
 arcpy.analysis.Buffer(xsln, xsln_buffer, buffer_distance, '', "FLAT")
 
-#%% 4 Clip statewide wwpt file by xsln buffer
+#%% 
+# 4 Join attributes from xsln to statewide wwpt within xsln buffer
+#KEEP_COMMON drops wells outside the buffer, so no separate clip is needed
 
-printit("Clipping statewide CWI wwpt file with xsln buffer.")
-arcpy.env.overwriteOutput = True
+printit("Spatial join xsln attributes to statewide CWI well points within xsln buffer.")
 
 state_wwpt = r'J:\ArcGIS_scripts\mgs_sitepackage\layer_files\MGSDB5.mgs_cwi.mgsstaff.sde\mgs_cwi.cwi.loc_wells'
-wwpt_temp = os.path.join(output_gdb, 'wwpt_temp')
-
-arcpy.analysis.Clip(state_wwpt, xsln_buffer, wwpt_temp)
-
-#%% 
-# 4 Join attributes from xsln to wwpt
-
-printit("Spatial join xsln attributes to well points.")
-arcpy.env.overwriteOutput = True
 wwpt = os.path.join(output_gdb, 'wwpt')
-arcpy.analysis.SpatialJoin(wwpt_temp, xsln_buffer, wwpt, 'JOIN_ONE_TO_MANY')
+arcpy.analysis.SpatialJoin(state_wwpt, xsln_buffer, wwpt, 'JOIN_ONE_TO_MANY', 'KEEP_COMMON', match_option='INTERSECT')
 
 '''
 printit("Creating archival wwpt file with today's date.")
@@ -121,41 +118,24 @@ arcpy.conversion.FeatureClassToFeatureClass(wwpt, output_gdb, "wwpt" + date)
 
 #%% 
 # 5 Make strat table
-printit("Clipping statewide stratigraphy data with xsln buffer.")
+printit("Spatial join xsln attributes to statewide stratigraphy points within xsln buffer.")
 
 #I think this point file has all of the attributes needed?
 state_strat_points = r'J:\ArcGIS_scripts\mgs_sitepackage\layer_files\MGSDB5.mgs_cwi.mgsstaff.sde\mgs_cwi.cwi.stratigraphy'
 
-#clip statewide strat points
-strat_points_temp = os.path.join(output_gdb, "strat_temp")
-arcpy.analysis.Clip(state_strat_points, xsln_buffer, strat_points_temp)
-
-#spatial join with xsln buffer
-printit("Spatial join xsln attributes to stratigraphy points.")
+#spatial join with xsln buffer, keeping only points inside the buffer
 strat_points_temp2 = os.path.join(output_gdb, "strat_temp2")
-arcpy.analysis.SpatialJoin(strat_points_temp, xsln_buffer, strat_points_temp2, 'JOIN_ONE_TO_MANY')
+arcpy.analysis.SpatialJoin(state_strat_points, xsln_buffer, strat_points_temp2, 'JOIN_ONE_TO_MANY', 'KEEP_COMMON', match_option='INTERSECT')
 
 #export strat points temp2 to geodatabase table
 printit("Exporting temp stratigraphy points to geodatabase table.")
-temp_table_view = "temp_table_view"
-arcpy.management.MakeTableView(strat_points_temp2, temp_table_view)
 strat_table = os.path.join(output_gdb, "strat_cwi")
-try:
-    #TableToTable is apparently depricated, but the newer version (ExportTable)
-    #isn't working? This way, one of them should work.
-    arcpy.conversion.ExportTable(temp_table_view, strat_table)
-except:
-    arcpy.conversion.TableToTable(temp_table_view, output_gdb, "strat_cwi")
+#CopyRows copies the attributes of a feature class without its geometry
+arcpy.management.CopyRows(strat_points_temp2, strat_table)
 
 #%% 
 # 6 Delete temporary files
 printit("Deleting temporary files.")
-try: arcpy.management.Delete(wwpt_temp)
-except: printit("Unable to delete {0}.".format(wwpt_temp))
-
-try: arcpy.management.Delete(strat_points_temp)
-except: printit("Unable to delete {0}.".format(strat_points_temp))
-
 try: arcpy.management.Delete(strat_points_temp2)
 except: printit("Unable to delete {0}.".format(strat_points_temp2))
 
@@ -21,6 +21,7 @@ will output data in the stacked or traditional display.
 import arcpy
 import os
 import datetime
+import numpy
 
 # Record tool start time
 toolstart = datetime.datetime.now()
@@ -46,8 +47,16 @@ def FileExists(file):
         printerror("Error: {0} does not exist.".format(os.path.basename(file)))
     #else: printit("{0} found.".format(os.path.basename(file)))
     
+#field names are cached per dataset so checking several fields only lists them once
+field_name_cache = {}
+
+def fieldNames(dataset):
+    if dataset not in field_name_cache:
+        field_name_cache[dataset] = {field.name for field in arcpy.ListFields(dataset)}
+    return field_name_cache[dataset]
+
 def FieldExists(dataset, field_name):
-    if field_name in [field.name for field in arcpy.ListFields(dataset)]:
+    if field_name in fieldNames(dataset):
         return True
     else:
         printerror("Error: {0} field does not exist in {1}."
@@ -62,6 +71,31 @@ def correctGeometry(file, geometry1, geometry2):
             printerror("Error: {0} does not have {1} geometry.".format(os.path.basename(file), geometry1))
     #else: printit("{0} has {1} geometry.".format(os.path.basename(file), geometry))
 
+# Define function to find the nearest point on a line for an array of points.
+# line_xy is an array of line vertex coordinates and point_xy is an array of point
+# coordinates. Each point is projected onto every segment of the line and the
+# closest projection is kept. Returns the distance from each point to the line
+# and the distance along the line to the nearest point.
+
+def nearestOnLine(line_xy, point_xy):
+    seg_start = line_xy[:-1]
+    seg_vector = line_xy[1:] - seg_start
+    seg_length_sq = (seg_vector ** 2).sum(axis=1)
+    start_to_point = point_xy[:, None, :] - seg_start[None, :, :]
+    #position of the projection along each segment, from 0 at the start to 1 at the end
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t = (start_to_point * seg_vector).sum(axis=2) / seg_length_sq
+    t = numpy.clip(numpy.nan_to_num(t), 0, 1)
+    offset = start_to_point - t[:, :, None] * seg_vector
+    dist_sq = (offset ** 2).sum(axis=2)
+    nearest_seg = dist_sq.argmin(axis=1)
+    rows = numpy.arange(len(point_xy))
+    near_dist = numpy.sqrt(dist_sq[rows, nearest_seg])
+    seg_length = numpy.sqrt(seg_length_sq)
+    seg_start_dist = numpy.concatenate(([0], numpy.cumsum(seg_length)[:-1]))
+    online_dist = seg_start_dist[nearest_seg] + t[rows, nearest_seg] * seg_length[nearest_seg]
+    return near_dist, online_dist
+
 # %% 
 # 2 Set parameters to work in testing and compiled geopocessing tool
 
@@ -136,22 +170,25 @@ if display_system == "stacked":
     FieldExists(xsln_file_orig, 'mn_et_id')
 
     #check that well point file has mn_et_id and join the field if it doesn't
-    if 'mn_et_id' in [field.name for field in arcpy.ListFields(wwpt_file_orig)]:
+    if 'mn_et_id' in fieldNames(wwpt_file_orig):
         printit("Good, mn_et_id field already exists in well point file.")
     else:
         printit("Adding mn_et_id field to well point file based on et_id in xsln file.")
         arcpy.management.JoinField(wwpt_file_orig, wwpt_etid_field, xsln_file_orig, xsln_etid_field, ['mn_et_id'])
+        fieldNames(wwpt_file_orig).add('mn_et_id')
 
 # %% 
 # 6 Data QC
 
 #determine if input cross section lines have multipart features
+#et_ids are stored at the same time for the checks in section 8
 multipart = False
-with arcpy.da.SearchCursor(xsln_file_orig, ["SHAPE@"]) as cursor:
+xsln_etid_set = set()
+with arcpy.da.SearchCursor(xsln_file_orig, ["SHAPE@", xsln_etid_field]) as cursor:
     for row in cursor:
         if row[0].isMultipart:
             multipart = True
-            break
+        xsln_etid_set.add(row[1])
 if multipart:
     printerror("Warning: cross section file contains multipart features. Continuing may result in errors.")
 
@@ -183,82 +220,57 @@ if xsln_count == 0:
 
 printit("Checking that stratigraphy table, well point file, and cross section line file all match.")
 
-# Create empty lists to store well IDs and et_ids in each file
-strat_wellid_list = []
-wwpt_wellid_list = []
-wwpt_etid_list = []
-xsln_etid_list = []
+# Read strat records and well points once. The same records are used to create geometry later.
+#with arcpy.da.SearchCursor(strat_table, [strat_wellid_field, strat_etid_field]) as strat_records:
+with arcpy.da.SearchCursor(strat_table, ['OID@', strat_wellid_field, 'elev_top',
+                                         'elev_bot']) as strat_records:
+    strat_record_list = list(strat_records)
 
-# Populate strat table wellid and et_id lists
+if display_system == "stacked":
+    #mn_et_id needed for stacked
+    wwpt_cursor_fields = ['SHAPE@X', 'SHAPE@Y', wwpt_etid_field, wwpt_wellid_field, 'mn_et_id']
+if display_system == "traditional":
+    wwpt_cursor_fields = ['SHAPE@X', 'SHAPE@Y', wwpt_etid_field, wwpt_wellid_field]
+with arcpy.da.SearchCursor(wwpt_file_orig, wwpt_cursor_fields) as wwpt_records:
+    wwpt_record_list = list(wwpt_records)
 
-#with arcpy.da.SearchCursor(strat_table, [strat_wellid_field, strat_etid_field]) as strat_records:
-with arcpy.da.SearchCursor(strat_table, [strat_wellid_field]) as strat_records:
-    for row in strat_records:
-        wellid = row[0]
-        if wellid not in strat_wellid_list:
-            strat_wellid_list.append(wellid)
-
-# Populate well point file wellid and et_id lists
-with arcpy.da.SearchCursor(wwpt_file_orig, [wwpt_wellid_field, wwpt_etid_field]) as wwpt_records:
-    for row in wwpt_records:
-        wellid = row[0]
-        etid = row[1]
-        if wellid not in wwpt_wellid_list:
-            wwpt_wellid_list.append(wellid)
-        if etid not in wwpt_etid_list:
-            wwpt_etid_list.append(etid)
-
-# Populate cross section line et_id list            
-with arcpy.da.SearchCursor(xsln_file_orig, [xsln_etid_field]) as xsln_records:
-    for line in xsln_records:
-        etid = line[0]
-        if etid not in xsln_etid_list:
-            xsln_etid_list.append(etid)
+# Populate strat table wellid set, and well point file wellid and et_id sets
+# Cross section line et_id set was populated in section 6
+strat_wellid_set = {row[1] for row in strat_record_list}
+wwpt_wellid_set = {row[3] for row in wwpt_record_list}
+wwpt_etid_set = {row[2] for row in wwpt_record_list}
 
 # Print warning if strat record(s) have no matching well point(s).
-listprint = []
-for wellid in strat_wellid_list:
-    if wellid not in wwpt_wellid_list:
-        listprint.append(wellid)
-listprint_len = len(listprint)
+listprint_len = len(strat_wellid_set - wwpt_wellid_set)
 if listprint_len > 0:
     printit("Warning: {0} stratigraphy records have no matching well points. Well stick diagrams will not draw for these records.".format(listprint_len))
 
 # Print warning if well point(s) have no matching stratigrapy records.
-listprint = []
-for wellid in wwpt_wellid_list:
-    if wellid not in strat_wellid_list:
-        listprint.append(wellid)
-listprint_len = len(listprint)
+listprint_len = len(wwpt_wellid_set - strat_wellid_set)
 if listprint_len > 0:
     printit("Warning: {0} well points have no matching stratigraphy records. Well stick diagrams will not draw for these wells.".format(listprint_len))
 
 # Check that et_id fields in well point file have matching xsln et_id
-listprint = []      
-for etid in wwpt_etid_list:
-    if etid not in xsln_etid_list:
-        listprint.append(etid)
+listprint = sorted(wwpt_etid_set - xsln_etid_set, key=str)
 listprint_len = len(listprint)
 if listprint_len > 0:
         printit("Warning: there are {0} et_id's in well point file that do not match any et_id's in cross section line file. Well point et_id's are: {1}".format(listprint_len, listprint))
 
 # Check that all cross section lines have matching well points
-listprint = []      
-for etid in xsln_etid_list:
-    if etid not in wwpt_etid_list:
-        listprint.append(etid)
+listprint = sorted(xsln_etid_set - wwpt_etid_set, key=str)
 listprint_len = len(listprint)
 if listprint_len > 0:
         printit("Warning: there are {0} cross section lines that do not have any associated well points. Cross section et_id's are: {1}".format(listprint_len, listprint))
     
 # Check that well id in strat and well point files have the same data type
-if type(strat_wellid_list[0]) != type(wwpt_wellid_list[0]):
+numeric_field_types = ('SmallInteger', 'Integer', 'BigInteger', 'Single', 'Double', 'OID')
+strat_wellid_is_numeric = arcpy.ListFields(strat_table, strat_wellid_field)[0].type in numeric_field_types
+wwpt_wellid_is_numeric = arcpy.ListFields(wwpt_file_orig, wwpt_wellid_field)[0].type in numeric_field_types
+if strat_wellid_is_numeric != wwpt_wellid_is_numeric:
     printerror("Warning: strat table and well point file have mismatched data types in the well id field. Wells and stratigraphy records will not be matched correctly.")
 
-# Set boolean variable that stores data type of well id field (needed for defining Where Clause later)
-wellid_is_numeric = True
-if type(strat_wellid_list[0]) == str:
-    wellid_is_numeric = False
+# Set boolean variable that stores data type of well id field (needed for defining well id field type later)
+wellid_is_numeric = strat_wellid_is_numeric
   
 # %% 
 # 9 List fields that are used in 3d line, 2d line, and 2d point
@@ -326,283 +338,173 @@ polyline_2d_fields = fields_base + fields_strat + fields_2d
 arcpy.management.AddFields(polylinefile_2d, polyline_2d_fields)
 
 #%% 
-# 12 Create feature dataset to store wwpt files by xs
-# wwpt files need to be split by xs to ensure that each well is referencing the correct xsln
-arcpy.env.overwriteOutput = True
-printit("Creating feature dataset for temporary file storage and copying well point file.")
-arcpy.management.CreateFeatureDataset(workspace, "wwpt_by_xs")
-wwpt_by_xs_fd = os.path.join(workspace, "wwpt_by_xs")
-
-# Make a temporary copy of the wwpt file and put it in the new feature dataset
-# Code below will grab selected features from this temporary wwpt file.
-# The temporary file will be deleted when geometry is completed.
-wwpt_file_temp = os.path.join(wwpt_by_xs_fd, "wwpt_temp")
-arcpy.management.CopyFeatures(wwpt_file_orig, wwpt_file_temp)
-
-#%% 12 Add fields to temporary wwpt point feature class
-# These fields will be populated by near analysis and measure on line functions
-
-wwpt_fields = [["NEAR_FID", "LONG"], ["NEAR_DIST", "DOUBLE"], ["NEAR_X", "DOUBLE"], 
-               ["NEAR_Y", "DOUBLE"]]
-#add online distance field, necessary for plotting in the traditional display
-if display_system == "traditional":
-    wwpt_fields.append(["OnLine_DIST", "FLOAT"])
-
-for newfield in wwpt_fields:
-    if newfield[0] in [field.name for field in arcpy.ListFields(wwpt_file_temp)]:
-        printit("{0} field already exists in well point file. Tool will overwrite data in this field.".format(newfield[0]))
-    else:
-        printit("Adding {0} field to well point file.".format(newfield[0]))
-        arcpy.management.AddField(wwpt_file_temp, newfield[0], newfield[1])
-
-#%% 
-# 13 Create a temporary xsln file and extend the lines equal to buffer distance
-    # The extended xsln file is used to define 2d x coordinates of wells
+# 12 Extend the xsln lines equal to buffer distance
+    # The extended xsln lines are used to define 2d x coordinates of wells
     # to ensure that wells beyond the xsln plot correctly
-# Create temporary xsln file (empty for now)
-xsln_temp = os.path.join(workspace, "xsln_temp")
-arcpy.management.CreateFeatureclass(workspace, "xsln_temp", "POLYLINE", '', 'DISABLED', 'DISABLED', spatialref)
-
-# add et_id and mn_et_id (stacked only) fields to temp xsln file
-arcpy.management.AddField(xsln_temp, xsln_etid_field, "TEXT")
-if display_system == "stacked":
-    arcpy.management.AddField(xsln_temp, 'mn_et_id', "TEXT")
-printit("Creating temporary xsln file to ensure wells beyond xsln endpoints plot correctly.")
-# Read geometries of original xsln file and create new geometry in temp xsln file
-# Temp xsln file will have the first and last segments extended equal to xsln spacing
+printit("Extending xsln lines to ensure wells beyond xsln endpoints plot correctly.")
+# Read geometries of original xsln file and store extended vertex coordinates by et_id
+# The first and last segments are extended equal to xsln spacing
 # This is to ensure that near analysis function will find the correct point for
 # wells beyond the from and to nodes of the cross section line.
-
-#cursor fields will include mn_et_id for stacked, not necessary for traditional
-if display_system == "traditional":
-    cursor_fields = ['SHAPE@', xsln_etid_field]
-if display_system == "stacked":
-    cursor_fields = ['SHAPE@', xsln_etid_field, "mn_et_id"]
-
-with arcpy.da.SearchCursor(xsln_file_orig, cursor_fields) as xsln:
+xsln_xy_dict = {}
+with arcpy.da.SearchCursor(xsln_file_orig, ['SHAPE@', xsln_etid_field]) as xsln:
     for line in xsln:
-        et_id = line[1]
-        if display_system == "stacked":
-            mn_et_id = line[2]
-        geompointlist = []
-        # Fill geompoint list with list of vertices in the xsln as point geometry objects
-        for vertex in line[0].getPart(0): #for each vertex in array of point objects
-            point = arcpy.PointGeometry(arcpy.Point(vertex.X, vertex.Y))
-            geompointlist.append(point) 
-        # Set variables to define first two points
-        beg_pt = geompointlist[0]
-        beg_pt2 = geompointlist[1]
-        # Calculate angle of beginning line segment from second point to beginning
-        beg_angle_and_dist = beg_pt2.angleAndDistanceTo(beg_pt, "PLANAR")
-        beg_angle = beg_angle_and_dist[0] 
-        # Set variables to define last two points
-        end_pt = geompointlist[-1]
-        end_pt2 = geompointlist[-2]
-        # Calculate angle of end line segment
-        end_angle_and_dist = end_pt2.angleAndDistanceTo(end_pt, "PLANAR")
-        end_angle = end_angle_and_dist[0] 
-        # Calculate new beginning and end points based on angle of segment and buffer distance
+        # Array of xsln vertex coordinates
+        xsln_xy = numpy.array([[vertex.X, vertex.Y] for vertex in line[0].getPart(0)])
+        # Calculate direction of beginning line segment from second point to beginning,
+        # and of end line segment from second to last point to end
+        beg_vector = xsln_xy[0] - xsln_xy[1]
+        end_vector = xsln_xy[-1] - xsln_xy[-2]
+        # Calculate new beginning and end points based on direction of segment and buffer distance
         # extending lines equal to buffer distance should capture all of the points
-        new_beg = beg_pt.pointFromAngleAndDistance(beg_angle, buffer_dist, method='PLANAR')
-        new_end = end_pt.pointFromAngleAndDistance(end_angle, buffer_dist, method='PLANAR')
-        # Change first and last coordinate values in geompointlist to use in creating temporary xsln file
-        geompointlist[0] = new_beg
-        geompointlist[-1] = new_end
-        # Turn geompointlist into point object list instead of point geometry objects
-        pointlist = []
-        for vertex in geompointlist:
-            newpt = vertex[0]
-            pointlist.append(newpt)
-        # Create arcpy array for writing geometry
-        xsln_array = arcpy.Array(pointlist)
-        # Turn array of point vertices into polyline object
-        new_xsln_geometry = arcpy.Polyline(xsln_array, spatialref, True)
-        with arcpy.da.InsertCursor(xsln_temp, cursor_fields) as cursor:
-            # Create geometry and fill in field values
-            if display_system == "traditional":
-                cursor.insertRow([new_xsln_geometry, et_id])
-            if display_system == "stacked":
-                cursor.insertRow([new_xsln_geometry, et_id, mn_et_id])
+        beg_length = numpy.hypot(*beg_vector)
+        end_length = numpy.hypot(*end_vector)
+        if beg_length > 0:
+            xsln_xy[0] = xsln_xy[0] + beg_vector / beg_length * buffer_dist
+        if end_length > 0:
+            xsln_xy[-1] = xsln_xy[-1] + end_vector / end_length * buffer_dist
+        xsln_xy_dict[line[1]] = xsln_xy
 
 #%% 
-# 14 Populate near analysis fields in wwpt file
-# This is populating fields in wwpt file that are used later to create geometry
-arcpy.env.overwriteOutput = True
+# 13 Calculate well locations in cross section view
+# Each well is measured against the extended xsln with the same et_id.
+# Well locations are stored in a dictionary keyed by well id, so each strat record
+# can find its well point without querying the well point file
 starttime = datetime.datetime.now()
-# Loop through each xsln_temp and create a geometry object for each line
-with arcpy.da.SearchCursor(xsln_temp, ['SHAPE@', xsln_etid_field]) as xsln:
-    for line in xsln:
-        et_id = line[1]
-        pointlist = []
-        for vertex in line[0].getPart(0):
-            # Creates a polyline geometry object from xsln_temp vertex points.
-            # Necessary for near analysis
-            point = arcpy.Point(vertex.X, vertex.Y)
-            pointlist.append(point)
-        array = arcpy.Array(pointlist)
-        xsln_geometry = arcpy.Polyline(array)
-        # Create a new wwpt file with only points associated with current xsln
-        printit("Calculating well locations in cross section view for line {0} out of {1}.".format(et_id, xsln_count))
-        wwpt_by_xs_file = os.path.join(wwpt_by_xs_fd, "wwpt_{0}".format(et_id))
-        arcpy.analysis.Select(wwpt_file_temp, wwpt_by_xs_file, '"{0}" = \'{1}\''.format(wwpt_etid_field, et_id))
-        # Do near analysis on wwpt file to populate near x, near y, and near dist fields
-        # Near x and y are the coordinates of the point along the xsln that are closest to the well
-        # "dist" is the distance between the well and the nearest point on the line
-        arcpy.analysis.Near(wwpt_by_xs_file, xsln_geometry, '', 'LOCATION', '', 'PLANAR')
-
-        # Calculate distance along line for traditional display
-        if display_system == "traditional":
-            with arcpy.da.UpdateCursor(wwpt_by_xs_file, ['OID@', 'NEAR_X', 'NEAR_Y', 'OnLine_DIST']) as wellpts:
-                for well in wellpts:
-                    index = well[0]
-                    x =  well[1]
-                    y = well[2]
-                    # Create point geometry object from nearest point on the xsln
-                    point = arcpy.Point(x, y)
-                    # Measure distance from start of xsln geometry object to defined point
-                    # This is the "OnLine_DIST" which turns into 2d x coordinate after vertical exaggeration calculation
-                    n = arcpy.Polyline.measureOnLine(xsln_geometry, point)
-                    #subtract extended line distance so points before start nodes will have negative values
-                    well[3] = n - buffer_dist 
-                    # Update field values in wwpt table to track near x, y, and OnLine dist
-                    wellpts.updateRow(well)
+printit("Calculating well locations in cross section view for {0} cross section lines.".format(xsln_count))
+# Group row number of wells read in section 8 by et_id
+# Wells without a matching cross section line or location are not drawn
+well_rows = []
+well_index_dict = {}
+for well in wwpt_record_list:
+    if well[2] not in xsln_xy_dict or well[0] is None or well[1] is None:
+        continue
+    well_index_dict.setdefault(well[2], []).append(len(well_rows))
+    well_rows.append(well)
+
+# Find the point along each xsln that is closest to each of its wells
+# "dist" is the distance between the well and the nearest point on the line
+# distance along line is the "OnLine_DIST" which turns into 2d x coordinate after vertical exaggeration calculation
+near_dist_array = numpy.zeros(len(well_rows))
+online_dist_array = numpy.zeros(len(well_rows))
+for et_id, well_index in well_index_dict.items():
+    point_xy = numpy.array([[well_rows[i][0], well_rows[i][1]] for i in well_index])
+    near_dist_array[well_index], online_dist_array[well_index] = nearestOnLine(xsln_xy_dict[et_id], point_xy)
+
+wwpt_lookup = {}
+for i, well in enumerate(well_rows):
+    #if a well id is in the file more than once, the last well point is used
+    if display_system == "stacked":
+        wwpt_lookup[well[3]] = (well[0], well[1], near_dist_array[i], well[2], well[4])
+    if display_system == "traditional":
+        #subtract extended line distance so points before start nodes will have negative values
+        wwpt_lookup[well[3]] = (well[0], well[1], near_dist_array[i], well[2], online_dist_array[i] - buffer_dist)
         
 endtime = datetime.datetime.now()
 elapsed = endtime - starttime
 printit('Near analysis and line measuring completed at {0}. Elapsed time: {1}'.format(endtime, elapsed))
 
-#%% 
-# 15 Delete wwpt_temp from feature dataset
-
-arcpy.management.Delete(wwpt_file_temp)
-
-#%% 
-# 16 Merge together wwpt by xs files into one file
-
-arcpy.env.workspace = wwpt_by_xs_fd
-wwpt_list = arcpy.ListFeatureClasses()
-printit("Creating mapview well point file with cross section locations calculated.")
-wwpt_list_paths = []
-for file in wwpt_list:
-    path = os.path.join(wwpt_by_xs_fd, file)
-    wwpt_list_paths.append(path)
-
-wwpt_merge = os.path.join(workspace, "wwpt_merge")
-arcpy.management.Merge(wwpt_list_paths, wwpt_merge)
-
 #%%
-# 17 Create 3D and 2D polyline geometry from strat and wwpt tables
+# 14 Create 3D and 2D polyline geometry from strat and wwpt tables
 starttime = datetime.datetime.now()
 printit('Polyline geometry creation started at {0}'.format(starttime))
 nomatch_list = [] #list to store well id's from the strat table with no matching well point
 
-# Define variables in search cursor object
-with arcpy.da.SearchCursor(strat_table, ['OID@', strat_wellid_field, 'elev_top',
-                                         'elev_bot']) as strat_records:
-    for row in strat_records:
-        strat_oid = row[0]
-        wellid = row[1] 
-        real_z_top = row[2] #true elevation
-        real_z_bot = row[3] #true elevation
-        if real_z_top == None:
-            printit("Error: Strat record {0} has no value in elev_top field. Skipping.".format(strat_oid))
-            continue
-        if real_z_bot == None:
-            printit("Error: Strat record {0} has no value in elev_bot field. Skipping.".format(strat_oid))
-            continue
-       
-        # Define two where_clauses for wwpt file query to handle numeric or text
-        where_clause = "{0}={1}".format(wwpt_wellid_field, wellid) #where clause for numeric data type (default)
-        if not wellid_is_numeric:
-            where_clause = "{0}='{1}'".format(wwpt_wellid_field, wellid) #redefine where clause for string data type
-        index_int = int(strat_oid)
-        if index_int % 1000 == 0: #print statement every 1000th record to track progress
-            printit('Creating polylines for strat record {0} out of {1}'.format(strat_oid, strat_count))
-        
-        # Find well location that matches strat record well id and get coordinates and et_id information
-        if display_system == "stacked":
-            #mn_et_id needed for stacked
-            cursor_fields = ['SHAPE@X', 'SHAPE@Y', 'NEAR_DIST', wwpt_etid_field, 'mn_et_id']
-        if display_system == "traditional":
-            #OnLine_DIST needed for traditional
-            cursor_fields = ['SHAPE@X', 'SHAPE@Y', 'NEAR_DIST', wwpt_etid_field, 'OnLine_DIST']
-        with arcpy.da.SearchCursor(wwpt_merge, cursor_fields, where_clause) as wwpt:
-            i = 0 #index used to track if there are any well points that match the strat record
-            for well in wwpt:
-                i += 1
-                # Define x and y coordinate variables
-                real_x = well[0] # true well coordinate
-                real_y = well[1] # true well coordinate
-                dist = well[2]
-                et_id = well[3]
-                pct_dist = dist/buffer_dist*200        
-                #calculate x coordinate for 2d display
-                #calculation is different for each type of display
-                if display_system == "stacked":
-                    x_coord = real_x #2d x coordinate = true x coordinate
-                    mn_et_id = well[4]
-                    mn_etid_int = float(mn_et_id)
-                if display_system == "traditional":
-                    #Divide distance along line by vertical exaggeration 
-                    # to squish x axis for vertical exaggeration
-                    x_coord_meters = well[4]
-                    x_coord_feet = x_coord_meters/0.3048
-                    x_coord = x_coord_feet/vertical_exaggeration
-            if i == 0: #if there is no matching well point, move to the next strat record
-                nomatch_list.append(wellid)
-                continue
-        # Create 2 point objects (top and bottom, in true coordinates) from x, y, and z coordinates
-        real_pointA = arcpy.Point(real_x, real_y, real_z_top)
-        real_pointB = arcpy.Point(real_x, real_y, real_z_bot)
-        real_pointlist = [real_pointA, real_pointB]
-        real_array = arcpy.Array(real_pointlist)
+# Insert cursor fields for 3d and 2d polyline files
+insert_cursor_fields = ['SHAPE@', strat_wellid_field, xsln_etid_field, 'x_coord', 'y_coord', 
+                        'z_top', 'z_bot', 'strat_oid']
+insert_cursor_fields_2d = ['SHAPE@', strat_wellid_field, xsln_etid_field, 'x_coord','y_coord',
+                           'z_top', 'z_bot', 'strat_oid', 'distance', 'pct_dist']
+if display_system == "stacked":
+    # stacked version includes mn_et_id
+    insert_cursor_fields.append("mn_et_id")
+    insert_cursor_fields_2d.append('mn_et_id')
+
+# Match strat records read in section 8 to their well points
+# 2d coordinates are calculated for all records at once after matching
+strat_rows = [] #strat oid, well id, true top and bottom elevation, and matching well point of each record
+#print progress at most about 50 times
+report_every = max(1000, strat_count // 50)
+for strat_index, row in enumerate(strat_record_list):
+    strat_oid = row[0]
+    wellid = row[1] 
+    real_z_top = row[2] #true elevation
+    real_z_bot = row[3] #true elevation
+    if real_z_top == None:
+        printit("Error: Strat record {0} has no value in elev_top field. Skipping.".format(strat_oid))
+        continue
+    if real_z_bot == None:
+        printit("Error: Strat record {0} has no value in elev_bot field. Skipping.".format(strat_oid))
+        continue
+   
+    if strat_index % report_every == 0: #print statement every report_every records to track progress
+        printit('Creating polylines for strat record {0} out of {1}'.format(strat_index + 1, strat_count))
+    
+    # Find well location that matches strat record well id and get coordinates and et_id information
+    well = wwpt_lookup.get(wellid)
+    if well is None: #if there is no matching well point, move to the next strat record
+        nomatch_list.append(wellid)
+        continue
+    strat_rows.append((strat_oid, wellid, real_z_top, real_z_bot, well))
+
+# Calculate 2d x and y coordinates of all strat records
+real_z_top_array = numpy.array([strat[2] for strat in strat_rows], dtype=float)
+real_z_bot_array = numpy.array([strat[3] for strat in strat_rows], dtype=float)
+if display_system == "stacked":
+    #2d x coordinate = true x coordinate
+    x_coord_array = numpy.array([strat[4][0] for strat in strat_rows], dtype=float)
+    # y coordinate is calculated using true z coordinate
+    mn_etid_array = numpy.array([strat[4][4] for strat in strat_rows], dtype=float)
+    #elevation with VE and meters conversion:
+    #(((z * 0.3048) - (county_relief * mn_et_id)) * vertical_exaggeration) + 23100000
+    z_scale = 0.3048 * vertical_exaggeration
+    mn_shift_array = (county_relief * vertical_exaggeration * mn_etid_array) - 23100000
+    y_top_array = (real_z_top_array * z_scale) - mn_shift_array
+    y_bot_array = (real_z_bot_array * z_scale) - mn_shift_array
+if display_system == "traditional":
+    #Divide distance along line by vertical exaggeration 
+    # to squish x axis for vertical exaggeration
+    x_coord_meters_array = numpy.array([strat[4][4] for strat in strat_rows], dtype=float)
+    x_coord_array = (x_coord_meters_array / 0.3048) / vertical_exaggeration
+    # y coordinate is the same as true z coordinate
+    y_top_array = real_z_top_array
+    y_bot_array = real_z_bot_array
+
+# Write 3d and 2d polylines
+#2d coordinates as python floats for the insert cursor
+x_coord_list = x_coord_array.tolist()
+y_top_list = y_top_array.tolist()
+y_bot_list = y_bot_array.tolist()
+# stacked version includes mn_et_id from the well point at the end of each row
+if display_system == "stacked":
+    extra_values_slice = slice(4, 5)
+if display_system == "traditional":
+    extra_values_slice = slice(4, 4)
+# Insert cursors stay open for the whole loop
+with arcpy.da.InsertCursor(polylinefile_3d, insert_cursor_fields) as cursor3d, \
+     arcpy.da.InsertCursor(polylinefile_2d, insert_cursor_fields_2d) as cursor2d:
+    for i, (strat_oid, wellid, real_z_top, real_z_bot, well) in enumerate(strat_rows):
+        # Define x and y coordinate variables
+        real_x = well[0] # true well coordinate
+        real_y = well[1] # true well coordinate
+        dist = well[2]
+        et_id = well[3]
+        pct_dist = dist/buffer_dist*200        
+        extra_values = list(well[extra_values_slice])
+        # Create array of 2 point objects (top and bottom, in true coordinates) from x, y, and z coordinates
+        real_array = arcpy.Array([arcpy.Point(real_x, real_y, real_z_top), arcpy.Point(real_x, real_y, real_z_bot)])
         # Turn 2 point objects into endpoints of a polyline segment
         real_polyline_geometry = arcpy.Polyline(real_array, spatialref, True)
-        # Create insert cursor object to write geometry
-        insert_cursor_fields = ['SHAPE@', strat_wellid_field, xsln_etid_field, 'x_coord', 'y_coord', 
-                                'z_top', 'z_bot', 'strat_oid']
-        if display_system == "stacked":
-            insert_cursor_fields.append("mn_et_id")
-        with arcpy.da.InsertCursor(polylinefile_3d, insert_cursor_fields) as cursor3d:
-            # Create geometry and fill in field values
-            if display_system == "traditional":
-                cursor3d.insertRow([real_polyline_geometry, wellid, et_id, real_x, real_y, real_z_top, real_z_bot, strat_oid])
-            if display_system == "stacked":
-                cursor3d.insertRow([real_polyline_geometry, wellid, et_id, real_x, real_y, real_z_top, real_z_bot, strat_oid, mn_et_id])
+        # Create geometry and fill in field values
+        cursor3d.insertRow([real_polyline_geometry, wellid, et_id, real_x, real_y, real_z_top, real_z_bot, strat_oid] + extra_values)
         
-        # Create 2 point objects (top and bottom) from x and y coordinates for 2d geometry
-        #first, calculate y coordinate in 2d space for each display system
-        if display_system == "traditional":
-            # y coordinate is the same as true z coordinate
-            y_top = real_z_top
-            y_bot = real_z_bot
-        if display_system == "stacked":
-            # y coordinate is calculated using true z coordinate
-            y_top = (((real_z_top * 0.3048) - (county_relief * mn_etid_int)) * vertical_exaggeration) + 23100000 #elevation with VE and meters conversion
-            y_bot = (((real_z_bot * 0.3048) - (county_relief * mn_etid_int)) * vertical_exaggeration) + 23100000 #elevation with VE and meters conversion
-
-        pointA = arcpy.Point(x_coord, y_top)
-        pointB = arcpy.Point(x_coord, y_bot)
-        pointlist = [pointA, pointB]
-        array = arcpy.Array(pointlist)
-        # Turn 2 point objects into endpoints of a polyline segment
-        polyline_geometry = arcpy.Polyline(array)
-
-        # Create insert cursor object 
-        insert_cursor_fields_2d = ['SHAPE@', strat_wellid_field, xsln_etid_field, 'x_coord','y_coord',
-                                   'z_top', 'z_bot', 'strat_oid', 'distance', 'pct_dist']
-        if display_system == "stacked":
-            # stacked version includes mn_et_id
-            insert_cursor_fields_2d.append('mn_et_id')
-        with arcpy.da.InsertCursor(polylinefile_2d, insert_cursor_fields_2d) as cursor2d:
-            # Create geometry and fill in field values, saving true coordinates in attribute
-            # stacked version includes mn_et_id
-            if display_system == "stacked":
-                cursor2d.insertRow([polyline_geometry, wellid, et_id, real_x, real_y,
-                                    real_z_top, real_z_bot, strat_oid, dist, pct_dist, mn_et_id])
-            if display_system == "traditional":
-                cursor2d.insertRow([polyline_geometry, wellid, et_id, real_x, real_y,
-                                    real_z_top, real_z_bot, strat_oid, dist, pct_dist])
+        # 2d geometry is written as a list of top and bottom coordinates
+        # insert cursor turns the coordinate pairs into the endpoints of a polyline segment
+        polyline_coords = [(x_coord_list[i], y_top_list[i]), (x_coord_list[i], y_bot_list[i])]
+
+        # Create geometry and fill in field values, saving true coordinates in attribute
+        cursor2d.insertRow([polyline_coords, wellid, et_id, real_x, real_y,
+                            real_z_top, real_z_bot, strat_oid, dist, pct_dist] + extra_values)
 
 endtime = datetime.datetime.now()
 elapsed = endtime - starttime
@@ -611,42 +513,39 @@ if len(nomatch_list) > 0:
 printit('Polyline geometry completed at {0}. Elapsed time: {1}'.format(endtime, elapsed))
 
 #%% 
-# 18 Create list of stratigraphy fields based on which fields exist and which are relevant
+# 15 Create list of stratigraphy fields based on which fields exist and which are relevant
 
 printit("Finding relevant stratigraphy data fields to join to output files.")
 
-strat_table_fields_all = arcpy.ListFields(strat_table)
-relevant_strat_fields = []
-for field in strat_table_fields_all:
-    name = field.name
-    relevant_strat_fields.append(name)
-
 # List fields that do not contain relevant stratigraphy information
 # These fields will not be joined to the output lixpys
-fields_not_to_join = ['OBJECTID','Join_Count','TARGET_FID', 'JOIN_FID', 'c5st_seq_no', 'relateid', 'depth_top',
+fields_not_to_join = frozenset(['OBJECTID','Join_Count','TARGET_FID', 'JOIN_FID', 'c5st_seq_no', 'relateid', 'depth_top',
                       'depth_bot', 'wellid', 'elev_top', 'elev_bot', 'bdrkelev', 'depth2bdrk', 'first_bdrk',
                       'last_strat', 'ohtopunit', 'ohtopelev', 'ohbotunit', 'ohbotelev', 'botholelev', 'aquifer',
                       'Join_Count_1', 'TARGET_FID_1', 'et_id', 'utmn', 'utme_min', 'utme_max', 'mn_et_id',
-                      'BUFF_DIST', 'ORIG_FID', 'strat_orig', 'GlobalID']
+                      'BUFF_DIST', 'ORIG_FID', 'strat_orig', 'GlobalID'])
 
 # By picking out fields NOT to join, the tool will automatically join fields unless the code tells it not to.
 # This means that by default, extra fields will be joined, rather than the other way around.
 
-# Remove fields from list that do not contain relevant stratigraphy information
-for field in fields_not_to_join:
-    if field in relevant_strat_fields:
-        relevant_strat_fields.remove(field)
+# List strat table fields in table order, leaving out fields that do not contain relevant stratigraphy information
+strat_table_fields_all = arcpy.ListFields(strat_table)
+relevant_strat_fields = [field.name for field in strat_table_fields_all if field.name not in fields_not_to_join]
 
 #%% 
-# 19 Join stratigraphy fields to 2d and 3d polyline feature classes
+# 16 Join stratigraphy fields to 2d and 3d polyline feature classes
+# join fields are indexed so each join looks up strat records instead of scanning the table.
+# Existing indexes (OBJECTID in the strat table) are reused
 
 printit("Joining relevant stratigraphy fields to 3d polyline file.")
-arcpy.management.JoinField(polylinefile_3d, 'strat_oid', strat_table, 'OBJECTID', relevant_strat_fields)
+arcpy.management.JoinField(polylinefile_3d, 'strat_oid', strat_table, 'OBJECTID', relevant_strat_fields,
+                           index_join_fields='OLD_INDEXES')
 printit("Joining relevant stratigraphy fields to 2d polyline file.")
-arcpy.management.JoinField(polylinefile_2d, 'strat_oid', strat_table, 'OBJECTID', relevant_strat_fields)
+arcpy.management.JoinField(polylinefile_2d, 'strat_oid', strat_table, 'OBJECTID', relevant_strat_fields,
+                           index_join_fields='OLD_INDEXES')
 
 #%% 
-# 20 Create 2d polygon lixpys from 2d lines
+# 17 Create 2d polygon lixpys from 2d lines
 arcpy.env.overwriteOutput = True
 printit('Creating 2D lixpy polygons from 2D lines.')
 
@@ -658,7 +557,8 @@ if display_system == "stacked":
     bufferdist = (vertical_exaggeration * 0.15) + 40
 
 # Set file path for new unsorted polygon file
-temp_polygon_file = os.path.join(workspace, 'lixpys_2d_poly_temp')
+# unsorted polygons are only read by Sort, so they are kept in memory
+temp_polygon_file = os.path.join('memory', 'lixpys_2d_poly_temp')
 # Create polygon feature class using buffer tool
 arcpy.analysis.Buffer(polylinefile_2d, temp_polygon_file, bufferdist, '', 'FLAT', '', '', 'PLANAR')
 
@@ -678,19 +578,16 @@ arcpy.management.Sort(temp_polygon_file, polygon_file, strat_wellid_field)
 printit('Create 2D lixpy polygons completed.')
 
 #%% 
-# 21 Delete temporary files/fields
+# 18 Delete temporary files/fields
 
-printit("Deleting temporary files from output geodatabase.")
+printit("Deleting temporary files.")
 try:
     arcpy.management.Delete(temp_polygon_file)
-    arcpy.management.Delete(wwpt_by_xs_fd)
-    arcpy.management.Delete(wwpt_merge)
-    arcpy.management.Delete(xsln_temp)
 except:
     printit("Warning: unable to delete all temporary files.")                          
                              
 #%% 
-# 22 Record and print tool end time
+# 19 Record and print tool end time
 toolend = datetime.datetime.now()
 toolelapsed = toolend - toolstart
 printit('Lixpy tool completed at {0}. Elapsed time: {1}. Youre a wizard!'.format(toolend, toolelapsed))
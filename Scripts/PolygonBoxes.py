@@ -19,6 +19,8 @@ applications as well.
 import arcpy
 import os
 import datetime
+import numpy
+import struct
 
 # Record tool start time
 toolstart = datetime.datetime.now()
@@ -44,8 +46,16 @@ def FileExists(file):
         printerror("Error: {0} does not exist.".format(os.path.basename(file)))
     #else: printit("{0} found.".format(os.path.basename(file)))
     
+#field names are cached per dataset so checking several fields only lists them once
+field_name_cache = {}
+
+def fieldNames(dataset):
+    if dataset not in field_name_cache:
+        field_name_cache[dataset] = {field.name for field in arcpy.ListFields(dataset)}
+    return field_name_cache[dataset]
+
 def FieldExists(dataset, field_name):
-    if field_name in [field.name for field in arcpy.ListFields(dataset)]:
+    if field_name in fieldNames(dataset):
         return True
     else:
         printerror("Error: {0} field does not exist in {1}."
@@ -60,6 +70,16 @@ def correctGeometry(file, geometry1, geometry2):
             printerror("Error: {0} does not have {1} geometry.".format(os.path.basename(file), geometry1))
     #else: printit("{0} has {1} geometry.".format(os.path.basename(file), geometry))
 
+# Define function to build rectangle polygon geometry from x and y coordinates
+# of its sides using well-known binary
+
+box_wkb = struct.Struct('<BIII10d')
+
+def boxFromXY(x_1, x_2, y_1, y_2):
+    #ring goes up the first side, across the top, down the last side and closes at the first corner
+    wkb = box_wkb.pack(1, 3, 1, 5, x_1, y_1, x_1, y_2, x_2, y_2, x_2, y_1, x_1, y_1)
+    return arcpy.FromWKB(bytearray(wkb))
+
 # %% 
 # 2 Set parameters to work in testing and compiled geopocessing tool
 
@@ -124,14 +144,11 @@ try:
 except:
     printit("Unable to add unique_id field. Field may already exist.")
 
-if 'OBJECTID' in [field.name for field in arcpy.ListFields(intersect_polys)]:
-    arcpy.management.CalculateField(intersect_polys, unique_id_field, "!OBJECTID!")
-elif 'objectid' in [field.name for field in arcpy.ListFields(intersect_polys)]:
-    arcpy.management.CalculateField(intersect_polys, unique_id_field, "!objectid!")
-elif 'FID' in [field.name for field in arcpy.ListFields(intersect_polys)]:
-    arcpy.management.CalculateField(intersect_polys, unique_id_field, "!FID!")
-elif 'fid' in [field.name for field in arcpy.ListFields(intersect_polys)]:
-    arcpy.management.CalculateField(intersect_polys, unique_id_field, "!fid!")
+#map lowercase field names to actual field names so OBJECTID or FID is found in any case
+field_name_map = {name.lower(): name for name in fieldNames(intersect_polys)}
+id_field = field_name_map.get('objectid') or field_name_map.get('fid')
+if id_field:
+    arcpy.management.CalculateField(intersect_polys, unique_id_field, "!{0}!".format(id_field))
 else: printerror("Error: input feature class does not contain OBJECTID or FID field. Conversion will not work without one of these fields.") 
     
 #%% 
@@ -157,10 +174,11 @@ arcpy.management.MultipartToSinglepart(output_fc_temp_multi, output_fc_temp)
 # 6 Create empty polygon file and add fields
 
 #define variable for temp geometry file
-output_poly_geom = os.path.join(output_dir, output_name + "_temp_geom")
+#geometry file is only read by Dissolve, so it is kept in memory
+output_poly_geom = os.path.join('memory', 'poly_boxes_temp_geom')
 
-printit("Creating empty line file for geometry creation.")
-arcpy.management.CreateFeatureclass(output_dir, output_name + "_temp_geom", 'POLYGON')
+printit("Creating empty polygon file in memory for geometry creation.")
+arcpy.management.CreateFeatureclass('memory', 'poly_boxes_temp_geom', 'POLYGON')
 fields = [[xsec_id_field, 'TEXT', '', 5], [unique_id_field, "LONG"]]
 if display_system == "stacked":
     fields.append(["mn_et_id", "TEXT", '', 5])
@@ -174,99 +192,69 @@ printit("Creating 2d line geometry.")
 if display_system == "stacked":
     fields = ['SHAPE@', xsec_id_field, unique_id_field, 'mn_et_id']
 
+    #read etid, unique id, mn_et_id and endpoint x coordinates of every line
+    line_records = []
+    first_x_list = []
+    last_x_list = []
     with arcpy.da.SearchCursor(output_fc_temp, fields) as cursor:
         for line in cursor:
-            etid = line[1]
-            mn_etid = line[3]
-            mn_etid_float = float(mn_etid)
-            unique_id = line[2]
-            #set top and bottom y coordinates for every x
-            y_2d_1 = (((50 * 0.3048) - (county_relief * mn_etid_float)) * vertical_exaggeration) + 23100000
-            y_2d_2 = (((2300 * 0.3048) - (county_relief * mn_etid_float)) * vertical_exaggeration) + 23100000
-            pointlist = []
-            x_list = []
-            for vertex in line[0].getPart(0):
-                #get x coordinate
-                x_2d = vertex.X
-                #make list of x coordinates in line
-                x_list.append(x_2d)
-            #create 2 vertical lines, one at each endpoint of the line
-            pt1 = arcpy.Point(x_list[0], y_2d_1)
-            pt2 = arcpy.Point(x_list[0], y_2d_2)
-            pt3 = arcpy.Point(x_list[-1], y_2d_2)
-            pt4 = arcpy.Point(x_list[-1], y_2d_1)
-
-            pointlist.append(pt1)
-            pointlist.append(pt2)
-            pointlist.append(pt3)
-            pointlist.append(pt4)
-            array = arcpy.Array(pointlist)
-            geometry = arcpy.Polygon(array)
+            #lines are single part after MultipartToSinglepart, so endpoints are the first and last x coordinates
+            first_x_list.append(line[0].firstPoint.X)
+            last_x_list.append(line[0].lastPoint.X)
+            line_records.append((line[1], line[2], line[3]))
+
+    #set top and bottom y coordinates for every line
+    mn_etid_array = numpy.array([float(record[2]) for record in line_records])
+    y_2d_1_array = (((50 * 0.3048) - (county_relief * mn_etid_array)) * vertical_exaggeration) + 23100000
+    y_2d_2_array = (((2300 * 0.3048) - (county_relief * mn_etid_array)) * vertical_exaggeration) + 23100000
+    y_2d_1_list = y_2d_1_array.tolist()
+    y_2d_2_list = y_2d_2_array.tolist()
+
+    with arcpy.da.InsertCursor(output_poly_geom, ['SHAPE@', unique_id_field, xsec_id_field, 'mn_et_id']) as cursor2d:
+        for i, (etid, unique_id, mn_etid) in enumerate(line_records):
+            #create 2 vertical lines, one at each endpoint of the line, and close them into a box
+            geometry = boxFromXY(first_x_list[i], last_x_list[i], y_2d_1_list[i], y_2d_2_list[i])
             #create geometry into output file
-            with arcpy.da.InsertCursor(output_poly_geom, ['SHAPE@', unique_id_field, xsec_id_field, 'mn_et_id']) as cursor2d:
-                cursor2d.insertRow([geometry, unique_id, etid, mn_etid])
+            cursor2d.insertRow([geometry, unique_id, etid, mn_etid])
 
 if display_system == "traditional":
-    # Create empty feature dataset for storing 3d profiles by xs number. Necessary for 2d geometry loop below.
-    printit("Creating feature dataset for storing temporary lines by cross section number.")
-    output_gdb_location = os.path.dirname(output_poly_geom)
-    lines_byxsec = os.path.join(output_gdb_location, "lines_by_xsec_temp")
-    arcpy.management.CreateFeatureDataset(output_gdb_location, "lines_by_xsec_temp", spatialref)
-    
+    # Group endpoints of the intersect lines by xsec number. Necessary for 2d geometry loop below.
+    printit("Grouping temporary lines by cross section number.")
+    lines_byxsec = {}
+    with arcpy.da.SearchCursor(output_fc_temp, ['SHAPE@', unique_id_field, xsec_id_field]) as cursor:
+        for feature in cursor:
+            lines_byxsec.setdefault(feature[2], []).append((feature[1], feature[0].firstPoint, feature[0].lastPoint))
+
     #2D y coordinates are the same for every box
     #approximate max and min elevations for the whole state
     y_2d_1 = 50
     y_2d_2 = 2300
 
-    with arcpy.da.SearchCursor(xsln, ['SHAPE@', xsec_id_field]) as xsln_cursor:
+    with arcpy.da.SearchCursor(xsln, ['SHAPE@', xsec_id_field]) as xsln_cursor, \
+         arcpy.da.InsertCursor(output_poly_geom, ['SHAPE@', unique_id_field, xsec_id_field]) as cursor2d:
         for line in xsln_cursor:
             etid = line[1]
-            xsln_pointlist = []
-            for apex in line[0].getPart(0):
-                # Creates a polyline geometry object from xsln vertex points.
-                # Necessary for MeasureOnLine method used later.
-                point = arcpy.Point(apex.X, apex.Y)
-                xsln_pointlist.append(point)
-            xsln_array = arcpy.Array(xsln_pointlist)
-            xsln_geometry = arcpy.Polyline(xsln_array)
-            # Create a new temp line file with intersect lines on the current xsln
-            line_by_xs_file = os.path.join(lines_byxsec, "{0}_{1}".format(xsec_id_field, etid))
-            arcpy.analysis.Select(output_fc_temp, line_by_xs_file, '"{0}" = \'{1}\''.format(xsec_id_field, etid))
+            # Creates a polyline geometry object from the first part of the xsln.
+            # Necessary for MeasureOnLine method used later.
+            xsln_geometry = arcpy.Polyline(line[0].getPart(0))
+            # 2D x coordinates measured on this xsln, keyed by mapview x and y.
+            # Neighboring boxes share endpoints, so each point is only measured once
+            x_2d_dict = {}
             printit("Writing 2D geometry for xsec {0}.".format(etid))
-            with arcpy.da.SearchCursor(line_by_xs_file, ['SHAPE@', unique_id_field]) as cursor:
-                for feature in cursor:
-                    unique_id = feature[1]
-                    #empty pointlist for storing 2D points
-                    pointlist = []
-                    # measure 2D x coordinate for first point
-                    first_pt = feature[0].firstPoint
-                    first_x_2d_meters = xsln_geometry.measureOnLine(first_pt)
-                    first_x_2d_feet = first_x_2d_meters/0.3048
-                    first_x_2d = first_x_2d_feet/vertical_exaggeration
-                    #measure 2D x coordinate for last point
-                    last_pt = feature[0].lastPoint
-                    last_x_2d_meters = xsln_geometry.measureOnLine(last_pt)
-                    last_x_2d_feet = last_x_2d_meters/0.3048
-                    last_x_2d = last_x_2d_feet/vertical_exaggeration
-                    #create points for corners of rectangle in 2D space
-                    pt1 = arcpy.Point(first_x_2d, y_2d_1)
-                    pt2 = arcpy.Point(first_x_2d, y_2d_2)
-                    pt3 = arcpy.Point(last_x_2d, y_2d_2)
-                    pt4 = arcpy.Point(last_x_2d, y_2d_1)
-                    #add points to list and create array and polygon geometry
-                    pointlist.append(pt1)
-                    pointlist.append(pt2)
-                    pointlist.append(pt3)
-                    pointlist.append(pt4)
-                    array = arcpy.Array(pointlist)
-                    geometry = arcpy.Polygon(array)
-                    #create geometry into output file
-                    with arcpy.da.InsertCursor(output_poly_geom, ['SHAPE@', unique_id_field, xsec_id_field]) as cursor2d:
-                        cursor2d.insertRow([geometry, unique_id, etid])
-
-    printit("Deleting temporary feature dataset {0}".format(lines_byxsec))
-    try: arcpy.management.Delete (lines_byxsec)
-    except: printit("Unable to delete temporary feature dataset")
+            # Intersect lines on the current xsln
+            for unique_id, first_pt, last_pt in lines_byxsec.get(etid, []):
+                # measure 2D x coordinate for first and last point
+                for pt in (first_pt, last_pt):
+                    if (pt.X, pt.Y) not in x_2d_dict:
+                        x_2d_meters = xsln_geometry.measureOnLine(pt)
+                        x_2d_feet = x_2d_meters/0.3048
+                        x_2d_dict[(pt.X, pt.Y)] = x_2d_feet/vertical_exaggeration
+                first_x_2d = x_2d_dict[(first_pt.X, first_pt.Y)]
+                last_x_2d = x_2d_dict[(last_pt.X, last_pt.Y)]
+                #create rectangle in 2D space from its sides
+                geometry = boxFromXY(first_x_2d, last_x_2d, y_2d_1, y_2d_2)
+                #create geometry into output file
+                cursor2d.insertRow([geometry, unique_id, etid])
 
 #%% 
 # 8 Dissolve and Join fields from original polygon file
@@ -281,36 +269,11 @@ if run_location == "Pro":
 printit("Dissolving output and joining attributes.")
 arcpy.management.Dissolve(output_poly_geom, output_poly_fc, [unique_id_field, xsec_id_field], '', 'SINGLE_PART')
 
-#create empty list for storing names of fields to join
-join_fields = []
-#list all fields in original polygons
-input_fields = arcpy.ListFields(intersect_polys)
-for field in input_fields:
-    name = field.name
-    join_fields.append(name)
-
-#remove redundant fields from list
-if "mn_et_id" in join_fields:
-    join_fields.remove("mn_et_id")
-if "unique_id" in join_fields:
-    join_fields.remove("unique_id")
-if "Shape" in join_fields:
-    join_fields.remove("Shape")
-if "OBJECTID" in join_fields:
-    join_fields.remove("OBJECTID")
-if "FID" in join_fields:
-    join_fields.remove("FID")
-if "Shape_Length" in join_fields:
-    join_fields.remove("Shape_Length")
-if "Shape_Area" in join_fields:
-    join_fields.remove("Shape_Area")
-if "TARGET_FID" in join_fields:
-    join_fields.remove("TARGET_FID")
-if "Join_Count" in join_fields:
-    join_fields.remove("Join_Count")
-if "et_id" in join_fields:
-    join_fields.remove("et_id")
-
+#list fields from original polygons that should not be joined to the output
+fields_not_to_join = frozenset(["mn_et_id", "unique_id", "Shape", "OBJECTID", "FID", "Shape_Length",
+                                "Shape_Area", "TARGET_FID", "Join_Count", "et_id"])
+#list names of all other fields in original polygons to join
+join_fields = [field.name for field in arcpy.ListFields(intersect_polys) if field.name not in fields_not_to_join]
 
 #join unit field using the unique id
 arcpy.management.JoinField(output_poly_fc, unique_id_field, intersect_polys, unique_id_field, join_fields)
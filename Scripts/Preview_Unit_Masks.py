@@ -44,8 +44,13 @@ def FileExists(file):
         printerror("Error: {0} does not exist.".format(os.path.basename(file)))
     #else: printit("{0} found.".format(os.path.basename(file)))
     
+#field names are cached per dataset so checking several fields only lists them once
+field_name_cache = {}
+
 def FieldExists(dataset, field_name):
-    if field_name in [field.name for field in arcpy.ListFields(dataset)]:
+    if dataset not in field_name_cache:
+        field_name_cache[dataset] = {field.name for field in arcpy.ListFields(dataset)}
+    if field_name in field_name_cache[dataset]:
         return True
     else:
         printerror("Error: {0} field does not exist in {1}."